@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+headless, reproducible benchmarks of the clustering engines.
+
+each workload is generated from a seed, then clustered by every engine for
+every distance. phases are timed separately and results are written as json
+and/or csv, plots are saved to a file (never displayed).
+
+    ./benchmarks.py --workloads uniform blobs --sizes 1000 10000 100000 \\
+        --engines grid sweep --json results.json --csv results.csv --plot results.png
+"""
+
+import csv
+import json
+from argparse import ArgumentParser
+from collections import defaultdict
+from functools import partial
+from time import perf_counter
+
+import connectes
+import grid
+import parallel
+import thresholds
+import workloads
+from incremental import IncrementalClusterer
+
+DISTANCES = [0.1, 0.075, 0.05, 0.025]
+SIZES = [1000, 10000, 100000]
+
+INCREMENTAL_STEPS = 10
+
+
+def incremental_cluster(distance, points):
+    """
+    union-find built by INCREMENTAL_STEPS successive batches.
+    """
+    clusterer = IncrementalClusterer(distance)
+    step = -(-len(points) // INCREMENTAL_STEPS)
+
+    for start in range(0, len(points), step):
+        clusterer.add_points(points[start:start + step])
+
+    return clusterer.components
+
+
+def engines(jobs):
+    """
+    engines building a union-find for one distance.
+    """
+    return {
+        "sweep": connectes.sweep_cluster,
+        "grid": grid.cluster,
+        "parallel": partial(parallel.cluster, jobs=jobs),
+        "incremental": incremental_cluster,
+    }
+
+
+def run(workload, size, seed, engine_names, distances, jobs):
+    """
+    benchmarks engines on one generated instance.
+    returns one record per (engine, distance).
+    """
+    start = perf_counter()
+    points = workloads.generate(workload, size, seed)
+    generate_time = perf_counter() - start
+
+    base = {"workload": workload, "size": size, "seed": seed, "generate_time": generate_time}
+    records = []
+
+    for engine in engine_names:
+
+        # Un seul passage pour toutes les distances
+        if engine == "thresholds":
+            start = perf_counter()
+            all_sizes = thresholds.components_sizes_by_distance(distances, points)
+            cluster_time = (perf_counter() - start) / len(distances)
+
+            for distance in distances:
+                records.append(dict(base, engine=engine, distance=distance, cluster_time=cluster_time,
+                                    sizes_time=0.0, components=len(all_sizes[distance]),
+                                    largest=max(all_sizes[distance], default=0)))
+            continue
+
+        for distance in distances:
+            start = perf_counter()
+            components = engines(jobs)[engine](distance, points)
+            cluster_time = perf_counter() - start
+
+            start = perf_counter()
+            sizes = components.component_sizes()
+            sizes_time = perf_counter() - start
+
+            records.append(dict(base, engine=engine, distance=distance, cluster_time=cluster_time,
+                                sizes_time=sizes_time, components=len(sizes), largest=max(sizes, default=0)))
+
+    return records
+
+
+def check_agreement(records):
+    """
+    records whose number of components differs between engines.
+    """
+    expected, disagreements = {}, []
+
+    for record in records:
+        key = (record["workload"], record["size"], record["seed"], record["distance"])
+        result = (record["components"], record["largest"])
+
+        if expected.setdefault(key, result) != result:
+            disagreements.append(record)
+
+    return disagreements
+
+
+def save_csv(filename, records):
+    """
+    one line per record.
+    """
+    with open(filename, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def save_plot(filename, records):
+    """
+    total time over all distances by size, one curve per engine, one graph per workload.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    totals = defaultdict(lambda: defaultdict(float))
+    for record in records:
+        totals[(record["workload"], record["engine"])][record["size"]] += record["cluster_time"] + record["sizes_time"]
+
+    workload_names = sorted({workload for workload, _ in totals})
+    figure, axes = plt.subplots(1, len(workload_names), figsize=(5 * len(workload_names), 4), squeeze=False)
+
+    for axis, workload in zip(axes[0], workload_names):
+        for (other_workload, engine), by_size in sorted(totals.items()):
+            if other_workload == workload:
+                sizes = sorted(by_size)
+                axis.plot(sizes, [by_size[size] for size in sizes], marker="o", label=engine)
+
+        axis.set_title(workload)
+        axis.set_xscale("log")
+        axis.set_yscale("log")
+        axis.set_xlabel("Effectif")
+        axis.set_ylabel("Temps (s)")
+        axis.legend()
+
+    figure.tight_layout()
+    figure.savefig(filename)
+    plt.close(figure)
+
+
+def main():
+    """
+    runs requested benchmarks and writes results.
+    """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--workloads", nargs="+", choices=workloads.WORKLOADS, default=["uniform"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--distances", nargs="+", type=float, default=DISTANCES)
+    parser.add_argument("--engines", nargs="+", default=["grid"],
+                        choices=list(engines(1)) + ["thresholds"])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--jobs", type=int, default=2, help="processes of the parallel engine")
+    parser.add_argument("--json", help="json results file")
+    parser.add_argument("--csv", help="csv results file")
+    parser.add_argument("--plot", help="image file of times by size")
+    arguments = parser.parse_args()
+
+    records = []
+
+    for workload in arguments.workloads:
+        for size in arguments.sizes:
+            for seed in arguments.seeds:
+                new_records = run(workload, size, seed, arguments.engines, arguments.distances, arguments.jobs)
+                records.extend(new_records)
+
+                for record in new_records:
+                    print(f"  {workload:15} {size:>9} {record['engine']:12} {record['distance']:<7}"
+                          f" {record['cluster_time'] + record['sizes_time']:9.4f}s  {record['components']} components")
+
+    for record in check_agreement(records):
+        print("  engines disagree :", record)
+
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as json_file:
+            json.dump(records, json_file, indent=1)
+
+    if arguments.csv and records:
+        save_csv(arguments.csv, records)
+
+    if arguments.plot and records:
+        save_plot(arguments.plot, records)
+
+
+if __name__ == '__main__':
+    main()
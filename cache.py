@@ -0,0 +1,142 @@
+"""
+content addressed on-disk cache of clustering results.
+
+a result is stored under a key made from a hash of the instance file
+contents, the distance and the engine : the same file clustered again the
+same way is answered without loading it. each result is one .npz file
+(sorted sizes, and labels if asked). the total size of the cache is bounded,
+least recently used results are evicted first.
+
+    cache = ResultCache(".connectes-cache")
+    key = cache.key(file_digest("instance.pts"), distance, "grid")
+    sizes, labels = cache.get(key) or (None, None)
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_DIRECTORY = ".connectes-cache"
+DEFAULT_MAX_BYTES = 256 << 20
+
+READ_SIZE = 1 << 20 # bytes hashed at a time
+
+
+def file_digest(filename):
+    """
+    sha256 of file contents (hex), read by blocks.
+    """
+    digest = hashlib.sha256()
+
+    with open(filename, "rb") as instance_file:
+        for block in iter(lambda: instance_file.read(READ_SIZE), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+        Résultats de clustering sur disque, un fichier .npz par résultat.
+
+        - key : clef d'un résultat (contenu, distance, moteur)
+        - get : (tailles, labels ou None) ou None si absent
+        - put : enregistre un résultat puis évince les plus anciens
+                tant que la taille totale dépasse max_bytes
+        - clear : vide le cache
+
+        La date de modification d'un fichier sert de date de dernier usage.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(digest, distance, engine):
+        """ Clef d'un résultat : hash du contenu, de la distance et du moteur. """
+
+        return hashlib.sha256(f"{digest}:{float(distance)!r}:{engine}".encode("ascii")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """ (tailles, labels ou None) du résultat, ou None s'il est absent. """
+
+        path = self.path(key)
+
+        try:
+            with np.load(path) as result:
+                sizes = result["sizes"].tolist()
+                labels = result["labels"] if "labels" in result else None
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # Dernier usage (le résultat lu a pu être évincé depuis par un autre processus)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return sizes, labels
+
+    def put(self, key, sizes, labels=None):
+        """ Enregistre un résultat (écriture atomique) puis applique la limite de taille. """
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        arrays = {"sizes": np.asarray(sizes, dtype=np.int64)}
+        if labels is not None:
+            arrays["labels"] = np.asarray(labels)
+
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as result_file:
+            np.savez(result_file, **arrays)
+
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def entries(self):
+        """ (date de dernier usage, taille, chemin) de chaque résultat. """
+
+        if not os.path.isdir(self.directory):
+            return []
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                try:
+                    status = entry.stat()
+                except FileNotFoundError:
+                    continue # évincé par un autre processus
+                entries.append((status.st_mtime, status.st_size, entry.path))
+
+        return entries
+
+    def evict(self):
+        """ Supprime les résultats les moins récemment utilisés au delà de max_bytes. """
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """ Supprime tous les résultats. """
+
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -2,28 +2,60 @@
 """
 compute sizes of all connected components.
 sort and display.
+
+usage as a library (no output, points are left untouched):
+
+    from connectes import cluster
+
+    result = cluster(distance, points)
+    result.labels # component of each point, in given order
+    result.sizes  # sorted sizes
+
+repeated runs over the same files can reuse results stored on disk:
+
+    ./connectes.py --cache instances/*.pts
+
+many files are clustered in parallel, one file per worker process:
+
+    ./connectes.py --batch --json instances/*.pts
+
+many distances are clustered in one pass, instead of the distance of the file:
+
+    ./connectes.py --distances 0.1,0.05,0.01 instance.pts
+
+an instance can be piped on stdin :
+
+    ./points_generator.py 0.01 1000000 | ./connectes.py -
 """
 
-from sys import argv
-from itertools import groupby
-from collections import defaultdict
+import json
+import os
+import sys
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
 
+import numpy as np
 
-# x------------------x
-# |  File Managment  |
-# x------------------x
+import grid
+import parallel
+import streaming
+import thresholds
+from cache import DEFAULT_DIRECTORY, ResultCache, file_digest
+from instances import load_instance, open_chunks, prefetch, read_distance
+from unionfind import DisjointSet
 
-def load_instance(filename):
-    """
-    loads .pts file.
-    returns distance limit and points.
-    """
-    with open(filename, "r", encoding="utf-8") as instance_file:
-        lines = iter(instance_file)
-        distance = float(next(lines))
-        points = [tuple(float(f) for f in l.split(",")) for l in lines]
+# Nombre de couples de points proches accumulés avant chaque fusion
+UNION_BATCH_SIZE = 1 << 16
+
+# Effectif au delà duquel une bande (cut) est coupée avant d'atteindre la hauteur distance
+CUT_POINTS = 64
 
-    return distance, points
+# Hauteur minimale d'une bande : distance / CUT_SPLITS
+CUT_SPLITS = 2
+
+# Marge sur la portée des bandes voisines (arrondis des calculs de distance)
+CUT_MARGIN = 1 + 1e-9
 
 
 # x----------x
@@ -52,33 +84,33 @@ def is_at_distance(point_1, point_2, distance):
 # |  cuts  |
 # x--------x
 
-def iter_near(graph, limits, cuts_key, point_id, forward = None):
+def iter_near(graph, limits, cuts_key, point_id, forward = None, stats = None):
     """
         Itérateur efficace sur les points à une distance
         maximale d'un point et d'un cut donnée.
         
         Paramètres:
         - graph : raccourci des structures données (points, cuts, distance)
-        - limits : dictionnaire d'entier (valeur par défaut 0) ayant pour clef
-                   un indice du dictionnaire de cut et pour valeur un indice
-                   de cut.
-        - cuts_key : clef du dictionnaire (cut à cibler)
+        - limits : liste d'entiers ayant pour indice un indice de cut
+                   et pour valeur un indice dans ce cut.
+        - cuts_key : indice du cut à cibler
         - point_id : indice de point centre, indice non-itéré
         - forward : booléen
             * True  : itérer sur les points d'abscisses supérieures au point d'indice point_id
             * False : itérer sur les points d'abscisses inférieures au point d'indice point_id
             * None  : itérer sur tous les points
+        - stats : SweepStats à compléter (ou None)
 
         Pré-conditions  :
         - l'indice point_id est supérieur à l'indice point_id de l'appel précédant 
-          (pour un même indice du dictionnaire de cut)
+          (pour un même indice de cut)
         - les cuts sont triés 
-        - les valeurs de limits sont telle que tous indices du cut (de clef de dictionnaire
-          de cuts) inférieurs à la valeur ne peuvent être à bonne distance
+        - les valeurs de limits sont telle que tous indices du cut (d'indice
+          de cut) inférieurs à la valeur ne peuvent être à bonne distance
           
         Post-conditions :
-        - les valeurs de limits sont telle que tous indices du cut (de clef de dictionnaire
-          de cuts) inférieurs à la valeur ne peuvent être à bonne distance
+        - les valeurs de limits sont telle que tous indices du cut (d'indice
+          de cut) inférieurs à la valeur ne peuvent être à bonne distance
     """
 
     # Initialisations
@@ -89,7 +121,7 @@ def iter_near(graph, limits, cuts_key, point_id, forward = None):
 
     # -- Before limit --
 
-    cut_id = limits[cuts_key]
+    limit_start = cut_id = limits[cuts_key]
 
     while cut_id < len(cut) and points[cut[cut_id]][0] < point[0] - distance:
         cut_id += 1
@@ -98,14 +130,20 @@ def iter_near(graph, limits, cuts_key, point_id, forward = None):
 
     # -- After limit --
 
+    scanned = 0
+
     if not forward or forward is None:
         # Before
+        scan_start = cut_id
+
         while cut_id < len(cut) and cut[cut_id] < point_id:
         
             if is_at_distance(point, points[cut[cut_id]], distance):
                 yield cut[cut_id]
 
             cut_id += 1
+
+        scanned = cut_id - scan_start
     else:
         # Skit before
         while cut_id < len(cut) and cut[cut_id] < point_id:
@@ -116,6 +154,8 @@ def iter_near(graph, limits, cuts_key, point_id, forward = None):
 
     # After
     if forward or forward is None:
+        scan_start = cut_id
+
         while cut_id < len(cut) and points[cut[cut_id]][0] <= point[0] + distance:
             
             if is_at_distance(point, points[cut[cut_id]], distance):
@@ -123,273 +163,652 @@ def iter_near(graph, limits, cuts_key, point_id, forward = None):
 
             cut_id += 1
 
-def iter_shift(graph, cuts_limits, cuts_key, relative_interval, point_id, forward = None):
+        scanned += cut_id - scan_start
+
+    # Compteurs
+    if stats is not None:
+        stats.scanned += scanned
+        stats.limits_advance += limits[cuts_key] - limit_start
+
+def iter_shift(graph, cuts_limits, cuts_key, relative_interval, point_id, forward = None, stats = None):
     """
         Itérateur efficace sur les points à une distance
         maximale d'un point et d'un interval de cuts donné.
         
         Paramètres:
         - graph : raccourci des structures données (points, cuts, distance)
-        - limits : dictionnaire d'entier (valeur par défaut 0) ayant pour clef
-                   un indice du dictionnaire de cut et pour valeur un indice
-                   de cut.
-        - relative_interval : interval de clefs du dictionnaire (cuts à cibler)
+        - limits : liste d'entiers ayant pour indice un indice de cut
+                   et pour valeur un indice dans ce cut.
+        - relative_interval : interval d'indices de cuts (relatif à cuts_key)
         - point_id : indice de point centre, indice non-itéré
         - forward : booléen
             * True  : itérer sur les points d'abscisses supérieures au point d'indice point_id
             * False : itérer sur les points d'abscisses inférieures au point d'indice point_id
             * None  : itérer sur tous les points
+        - stats : SweepStats à compléter (ou None)
 
         Pré-conditions  :
         - l'indice point_id est supérieur à l'indice point_id de l'appel précédant 
-          (pour un même indice du dictionnaire de cut)
+          (pour un même indice de cut)
         - les cuts sont triés 
-        - les valeurs de limits sont telle que tous indices du cut (de clef de dictionnaire
-          de cuts) inférieurs à la valeur ne peuvent être à bonne distance
+        - les valeurs de limits sont telle que tous indices du cut (d'indice
+          de cut) inférieurs à la valeur ne peuvent être à bonne distance
           
         Post-conditions :
-        - les valeurs de limits sont telle que tous indices du cut (de clef de dictionnaire
-          de cuts) inférieurs à la valeur ne peuvent être à bonne distance
+        - les valeurs de limits sont telle que tous indices du cut (d'indice
+          de cut) inférieurs à la valeur ne peuvent être à bonne distance
     """
 
     for aside_cut_id in range(cuts_key + relative_interval[0], cuts_key + relative_interval[1] + 1):
-        yield from iter_near(graph, cuts_limits, aside_cut_id, point_id, forward)
+        yield from iter_near(graph, cuts_limits, aside_cut_id, point_id, forward, stats)
 
 
-# x------------x
-# |  referents  |
-# x------------x
-
-def not_already_merged(referents, cluster_to_merge, referent_id, point_id):
+def cut_starts(ordinates, distance):
     """
-        Prédicat indiquant si deux points ont été fusionnés.
-        
+        Ordonnées de début des bandes (cuts), choisies selon les données.
+
         Paramètres:
-        - referents : dictionnaire des référents
-        - cluster_to_merge : cluster à fusionner
-        - referent_id : point 1 (référent)
-        - point_id : point 2
+        - ordinates : tableau trié des ordonnées des points
+        - distance : réel positif représentant une distance
 
-        Pré-conditions  : ...
-        Post-conditions : ...
+        Chaque bande commence à l'ordonnée d'un point et mesure au plus distance :
+        aucune bande n'est vide, les régions vides ne coûtent rien. Une bande
+        dense est coupée après CUT_POINTS points (quantile), sans descendre
+        sous distance / CUT_SPLITS.
     """
 
-    return point_id not in referents or (
-        referents[point_id] != referent_id and
-        ( referents[point_id] not in cluster_to_merge or referent_id         not in cluster_to_merge[referents[point_id]] ) and
-        ( referent_id         not in cluster_to_merge or referents[point_id] not in cluster_to_merge[referent_id        ] )
-    )
+    starts = []
+    position = 0
+
+    while position < len(ordinates):
+        start = ordinates[position]
+        end = start + distance
+
+        if position + CUT_POINTS < len(ordinates):
+            end = min(end, max(ordinates[position + CUT_POINTS], start + distance / CUT_SPLITS))
+
+        starts.append(start)
+        position = int(np.searchsorted(ordinates, end))
+
+    return np.array(starts, dtype=np.float64)
 
-def referents_add(referents, cluster_to_merge, wait_to_merge, referent_id, point_id):
+
+def build_cuts(points, distance):
     """
-        Ajoute un référent à un point.
-        
-        Paramètres:
-        - referents : dictionnaire des référents
-        - cluster_to_merge : cluster à fusionner
-        - wait_to_merge : liste des points en attente de fusion
-        - referent_id : point 1 (référent)
-        - point_id : point 2
+        Bandes horizontales des points triés par abscisse.
 
-        Pré-conditions  :
-        - point_id ne possède pas de référent
-        Post-conditions : ...
+        Retourne :
+        - cuts : liste des bandes, chacune liste croissante d'indices de points
+        - reaches : pour chaque point, intervalle relatif (premier, dernier)
+                    des bandes pouvant contenir un point à bonne distance
     """
 
-    # Ajout du référent dans le dictionnaire de référents
-    referents[point_id] = referent_id
+    ordinates = np.array([point[1] for point in points], dtype=np.float64)
+    starts = cut_starts(np.sort(ordinates), distance)
 
-    # Ajout d'une fusion pour chaque fusion en attente pour le point point_id
-    for old_ref_id in filter(
-            lambda old_ref_id : not_already_merged(referents, cluster_to_merge, referent_id, old_ref_id), 
-            wait_to_merge[point_id]
-        ):
-        cluster_to_merge[old_ref_id].add(referent_id)
+    reach = distance * CUT_MARGIN
+    cuts_keys = np.searchsorted(starts, ordinates, "right") - 1
+    firsts = np.maximum(np.searchsorted(starts, ordinates - reach, "right") - 1, 0)
+    lasts = np.searchsorted(starts, ordinates + reach, "right") - 1
 
-    wait_to_merge[point_id].clear()
+    by_cut = np.argsort(cuts_keys, kind="stable")
+    bounds = np.searchsorted(cuts_keys[by_cut], np.arange(len(starts) + 1))
+    cuts = [by_cut[start:end].tolist() for start, end in zip(bounds[:-1], bounds[1:])]
+
+    return cuts, list(zip(cuts_keys.tolist(), (firsts - cuts_keys).tolist(), (lasts - cuts_keys).tolist()))
+
+
+# x-----------x
+# |  Engines  |
+# x-----------x
+
+class SortedPoints:
+    """
+        Points (tableau (n, 2)) et permutation les triant par abscisse,
+        calculée une seule fois puis conservée avec les points.
+
+        - si les points sont déjà triés, aucun tri n'est fait
+        - extend ajoute des points en fusionnant leur tri avec celui conservé
+          (utile pour un jeu de points qui grandit, voir perfs.py)
+
+        Les points donnés ne sont jamais modifiés.
+    """
+
+    def __init__(self, points):
+        self.points = grid.as_points(points)
+        self._order = None
+
+    @property
+    def order(self):
+        """ Permutation triant les points par abscisse (stable). """
+
+        if self._order is None:
+            abscissas = self.points[:, 0]
+
+            if np.all(abscissas[1:] >= abscissas[:-1]):
+                self._order = np.arange(len(abscissas))
+            else:
+                self._order = np.argsort(abscissas, kind="stable")
+
+        return self._order
+
+    def extend(self, points):
+        """ Ajoute des points, le tri déjà calculé est complété par fusion. """
+
+        points = grid.as_points(points).reshape(-1, self.points.shape[1])
+        old_count = len(self.points)
+
+        if self._order is not None:
+            new_order = np.argsort(points[:, 0], kind="stable")
+            positions = np.searchsorted(self.points[self._order, 0], points[new_order, 0], "right")
+            self._order = np.insert(self._order, positions, new_order + old_count)
+
+        self.points = np.concatenate((self.points, points))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, index):
+        return self.points[index]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.points if dtype is None else self.points.astype(dtype)
+
+
+def sort_points(points):
+    """
+        Trie les points par abscisse, sans modifier les points donnés.
+
+        Paramètres:
+        - points : séquence de tuples, tableau numpy (n, 2) ou SortedPoints
+                   (dont la permutation déjà calculée est réutilisée)
+
+        Retourne :
+        - order : permutation triant les points (tableau d'indices)
+        - sorted_points : lignes triées (listes de flottants)
+    """
+
+    if not isinstance(points, SortedPoints):
+        points = SortedPoints(points)
+
+    return points.order, points.points[points.order].tolist()
 
-# x--------x
-# |  Main  |
-# x--------x
 
 def print_components_sizes(distance, points):
     """
     affichage des tailles triees de chaque composante
     """
 
+    sizes = components_sizes(distance, points)
+    print(sizes)
+
+    return sizes # To check validity
+
+
+def components_sizes(distance, points):
+    """
+    tailles triees de chaque composante (balayage par abscisse)
+    """
+
+    return sweep_cluster(distance, points).component_sizes()
+
+
+class SweepStats:
+    """
+        Mesures d'un balayage, remplies par sweep_cluster(..., stats=SweepStats()).
+
+        - times : durée en secondes de chaque phase (sort, cuts, sweep, fusion)
+        - scanned : candidats comparés par is_at_distance dans iter_near
+        - accepted : candidats à bonne distance
+        - limits_advance : avancée totale des pointeurs de cuts_limits
+        - merges : fusions de composantes
+
+        Chaque appel a ses propres mesures : utilisable depuis plusieurs threads.
+    """
+
+    PHASES = ("sort", "cuts", "sweep", "fusion")
+
+    def __init__(self):
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.scanned = 0
+        self.accepted = 0
+        self.limits_advance = 0
+        self.merges = 0
+
+    def as_dict(self):
+        """ Mesures sous forme de dictionnaire (json). """
+
+        return {
+            "times": dict(self.times),
+            "scanned": self.scanned,
+            "accepted": self.accepted,
+            "limits_advance": self.limits_advance,
+            "merges": self.merges,
+        }
+
+    def display(self):
+        """ Affiche les mesures. """
+
+        total = sum(self.times.values()) or 1.0
+
+        print('\n  Balayage :')
+        print("  x-----------------x----------x----------x")
+        for phase, time in self.times.items():
+            print(f"  | {phase:15} | {time:7.4f}s | {100 * time / total:7.3f}% |")
+        print("  x-----------------x----------x----------x")
+
+        print(f"  Candidats : {self.scanned}, acceptés : {self.accepted}")
+        print(f"  Avancée des limites : {self.limits_advance}, fusions : {self.merges}\n")
+
+
+def sweep_cluster(distance, points, stats = None, aggregate = False):
+    """
+        Union-find des points (dans l'ordre donné), calculé par balayage
+        des points triés par abscisse.
+
+        Paramètres:
+        - stats : SweepStats à compléter (ou None, sans surcoût)
+        - aggregate : les unions tiennent à jour les agrégats des composantes
+    """
+
     # x------------------x
     # |  Initialization  |
     # x------------------x
 
-    points.sort()
+    start = perf_counter()
+    dataset = points if isinstance(points, SortedPoints) else SortedPoints(points)
+    order, points = sort_points(dataset)
+    sorted_time = perf_counter()
 
     # Cuts
-    cuts = defaultdict(list)
-
-    for cut_key, cut_content in groupby(range(len(points)), lambda point_id: int(points[point_id][1] // distance)):
-        cuts[cut_key].extend(cut_content)
+    cuts, reaches = build_cuts(points, distance)
 
     # Limits
-    cuts_limits, cuts_limits_others = defaultdict(int), defaultdict(int)
+    cuts_limits = [0] * len(cuts)
 
     # Shortcut
     graph = (points, cuts, distance)
 
     # Clustering
-    referents = {}
+    components = DisjointSet(len(points), dataset.points if aggregate else None)
+    firsts, seconds = [], []
+    accepted, fusion_time = 0, 0.0
+
+    cuts_time = perf_counter()
 
-    cluster_to_merge = defaultdict(set)
-    wait_to_merge    = defaultdict(set)
-            
 
     # x--------x
     # |  Loop  |
     # x--------x
 
-    # Itération sur les points n'ayant pas de référents
-    for referent_id in filter(lambda point_id: point_id not in referents, range(len(points))):
+    for point_id, (cuts_key, *relative_interval) in enumerate(reaches):
 
-        point = points[referent_id]
+        # Itération sur les points :
+        # - d'abscisse supérieure au point courant
+        # - de bonne distance au point courant
+        # chaque couple de points proches est ainsi vu une seule fois
 
-        # x------------------x
-        # |  Initialization  |
-        # x------------------x
+        for near_id in iter_shift(graph, cuts_limits, cuts_key, relative_interval, point_id, True, stats):
+            firsts.append(point_id)
+            seconds.append(near_id)
 
-        # Components
-        y = point[1]
-        cuts_key = int(y // distance)
+        # Fusions par lots
+        if len(firsts) >= UNION_BATCH_SIZE:
+            accepted += len(firsts)
+            fusion_start = perf_counter()
 
-        # Le référent du point proche devient lui-même
-        referents_add(referents, cluster_to_merge, wait_to_merge, referent_id, referent_id)
+            components.union_pairs(order[firsts], order[seconds])
+            firsts.clear()
+            seconds.clear()
 
+            fusion_time += perf_counter() - fusion_start
 
-        # x----------x
-        # |  Groups  |
-        # x----------x
+    sweep_time = perf_counter()
 
-        # Itération sur les points :
-        # - de bonne distance du point proche
-        # - non à bonne distance du point courant
-        # - non déjà fusionné avec le point courant
+    accepted += len(firsts)
+    components.union_pairs(order[firsts], order[seconds])
 
-        for near_id in filter(
-                lambda near_id: not_already_merged(referents, cluster_to_merge, referent_id, near_id), 
-                iter_shift(graph, cuts_limits, cuts_key, (-1, 1), referent_id, False)
-            ):
-            cluster_to_merge[referent_id].add(referents[near_id])
+    if stats is not None:
+        end = perf_counter()
 
-        # Itération sur les points :
-        # - d'abscisse supérieure au point courant
-        # - de bonne distance au point courant
+        stats.times["sort"] += sorted_time - start
+        stats.times["cuts"] += cuts_time - sorted_time
+        stats.times["sweep"] += sweep_time - cuts_time - fusion_time
+        stats.times["fusion"] += end - sweep_time + fusion_time
+
+        stats.accepted += accepted
+        stats.merges += len(points) - len(components.component_sizes())
+
+    return components
 
-        for near_id in iter_shift(graph, cuts_limits, cuts_key, (-1, 1), referent_id, True):
 
-            if near_id not in referents.keys():
+# For tests perfs
+def main_perfs(distance, points):
+    return print_components_sizes(distance, points)
 
-                # Le référent du point proche devient le point courant
-                referents_add(referents, cluster_to_merge, wait_to_merge, referent_id, near_id)
 
-                # Itération sur les points :
-                # - de bonne distance du point proche
-                # - non à bonne distance du point courant
-                # - non déjà fusionné avec le point courant
+# x-------x
+# |  API  |
+# x-------x
 
-                for far_id in filter(
-                        lambda far_id: not_already_merged(referents, cluster_to_merge, referent_id, far_id) and
-                            not is_at_distance(point, points[far_id], distance),
-                        iter_shift(graph, cuts_limits_others, cuts_key, (-1, +1), near_id)
-                    ):
+# Moteurs : union-find des points, dans l'ordre donné
+ENGINES = {
+    "sweep": sweep_cluster,
+    "grid": grid.cluster,
+}
 
-                    if far_id in referents.keys():
+# Moteurs acceptant des points de toute dimension
+DIMENSION_FREE_ENGINES = {"grid"}
 
-                        # Ajout d'une fusion
-                        cluster_to_merge[referent_id].add(referents[far_id])
-                    else:
 
-                        # Ajout d'une fusion future
-                        wait_to_merge[far_id].add(referent_id)
-            
-            elif not_already_merged(referents, cluster_to_merge, referent_id, near_id):
+class Clustering:
+    """
+        Résultat d'un clustering, sans entrée ni sortie.
+
+        - labels : composante de chaque point, dans l'ordre des points donnés
+                   (entiers 32 bits, composantes numérotées par taille décroissante)
+        - sizes : tailles triées (décroissantes), sizes[label] est l'effectif
+                  de la composante label
+        - stats : agrégats des composantes (unionfind.ComponentStats, ligne label),
+                  si demandés
+    """
+
+    def __init__(self, labels, sizes, stats=None):
+        self.labels = labels
+        self.sizes = sizes
+        self.stats = stats
+
+    @classmethod
+    def from_components(cls, components):
+        """ Numérote les composantes d'un union-find par taille décroissante. """
+
+        stats = components.component_stats() if components.sums is not None else None
+
+        roots, inverse, counts = np.unique(components.roots(), return_inverse=True, return_counts=True)
+
+        by_size = np.argsort(-counts, kind="stable")
+        ranks = np.empty(len(roots), dtype=np.int32)
+        ranks[by_size] = np.arange(len(roots), dtype=np.int32)
+
+        return cls(ranks[inverse], counts[by_size].tolist(), stats)
+
+    def __len__(self):
+        return len(self.sizes)
+
+
+def cluster(distance, points, engine="grid", jobs=1, aggregate=False):
+    """
+        Composantes connexes des points à distance inférieure ou égale
+        à distance les uns des autres.
+
+        Paramètres:
+        - distance : réel positif représentant une distance
+        - points : tableau (n, dimension) ou séquence de tuples de coordonnées
+                   (non modifiés)
+        - engine : clef de ENGINES (seul grid accepte une dimension autre que 2)
+        - jobs : nombre de processus (moteur grid par bandes si supérieur à 1)
+        - aggregate : calcule aussi, pendant les unions, effectif, somme des
+                      coordonnées et boîte englobante de chaque composante
+
+        Retourne un Clustering.
+    """
+
+    if engine not in DIMENSION_FREE_ENGINES and jobs <= 1 and len(points) and len(points[0]) != 2:
+        raise ValueError(f"{engine} engine only clusters points in dimension 2")
+
+    if jobs > 1:
+        components = parallel.cluster(distance, points, jobs, aggregate=aggregate)
+    else:
+        components = ENGINES[engine](distance, points, aggregate=aggregate)
+
+    return Clustering.from_components(components)
+
+
+# x---------x
+# |  Cache  |
+# x---------x
+
+def cluster_instance(instance, engine="grid", jobs=1, results_cache=None, labels=False, refresh=False):
+    """
+        Clustering d'un fichier d'instance, pour la distance du fichier.
+
+        Paramètres:
+        - results_cache : ResultCache consulté puis complété (ou None)
+        - labels : les labels doivent être connus (et enregistrés dans le cache)
+        - refresh : recalcule le résultat même s'il est dans le cache
+
+        Retourne un Clustering (labels à None si lu dans le cache sans labels).
+    """
+
+    # Un flux ("-") ne peut être relu pour calculer son empreinte
+    if results_cache is None or instance == "-":
+        return cluster(*load_instance(instance), engine, jobs)
+
+    key = results_cache.key(file_digest(instance), read_distance(instance), engine)
+    cached = None if refresh else results_cache.get(key)
+
+    if cached is not None and (cached[1] is not None or not labels):
+        sizes, cached_labels = cached
+        return Clustering(cached_labels, sizes)
 
-                # Ajout d'une fusion
-                cluster_to_merge[referent_id].add(referents[near_id])
+    result = cluster(*load_instance(instance), engine, jobs)
+    results_cache.put(key, result.sizes, result.labels if labels else None)
 
+    return result
 
-    # x-----------x
-    # |  cluster_to_merge  |
-    # x-----------x
 
-    # Calcul du résultat
-    counts = fusion(referents, cluster_to_merge)
+def instance_sizes_by_distance(instance, distances, results_cache=None, refresh=False):
+    """
+        Tailles triées des composantes d'un fichier d'instance pour chaque
+        distance (voir thresholds), seules les distances absentes du cache
+        sont calculées, en un seul passage.
+    """
+
+    if results_cache is None or instance == "-":
+        return thresholds.components_sizes_by_distance(distances, load_instance(instance)[1])
+
+    digest = file_digest(instance)
+    keys = {distance: results_cache.key(digest, distance, "thresholds") for distance in distances}
+
+    sizes = {}
+    for distance, key in keys.items():
+        cached = None if refresh else results_cache.get(key)
+        if cached is not None:
+            sizes[distance] = cached[0]
 
-    print(sorted(counts, reverse=True))
+    missing = [distance for distance in distances if distance not in sizes]
+    if missing:
+        computed = thresholds.components_sizes_by_distance(missing, load_instance(instance)[1])
 
-    return sorted(counts, reverse=True) # To check validity
+        for distance in missing:
+            sizes[distance] = computed[distance]
+            results_cache.put(keys[distance], computed[distance])
 
+    return sizes
 
-def init_counts(referents):
+
+# x---------x
+# |  Batch  |
+# x---------x
+
+def batch_task(task):
     """
-    Create a dict of :\n
-    key = centroid\n
-    value = number of points in group[key]
+        Résultat d'un fichier, calculé dans un processus du lot.
+
+        Retourne (fichier, tailles ou dictionnaire distance -> tailles, erreur ou None).
     """
-    counts = defaultdict(int)
 
-    for _, point_id in referents.items():
-        counts[point_id] += 1
+    instance, engine, distances, results_cache, refresh = task
 
-    return counts
-    
+    try:
+        if distances:
+            return instance, instance_sizes_by_distance(instance, distances, results_cache, refresh), None
 
-def fusion(referents, cluster_to_merge):
-    """Réalise la fusion des points dans des groupes définitifs"""
+        return instance, cluster_instance(instance, engine, 1, results_cache, False, refresh).sizes, None
 
-    counts = init_counts(referents)
+    except (OSError, ValueError) as error:
+        return instance, None, str(error)
 
-    for node, nodes_to_merge in cluster_to_merge.items():
 
-        # Recherche de la racine
-        root = referents[node]
-        while root != referents[root]:
-            root = referents[root]
+def iter_batch(instances, engine="grid", distances=None, workers=None, results_cache=None,
+               refresh=False, ordered=True):
+    """
+        Résultats de nombreux fichiers calculés par un ensemble de processus,
+        chacun chargeant puis traitant ses fichiers (lecture et calcul se
+        recouvrent d'un processus à l'autre).
+
+        Itérateur sur les (fichier, résultat, erreur) de batch_task, dans
+        l'ordre des fichiers si ordered, sinon dans l'ordre de fin de calcul.
+    """
 
-        referents[node] = root
+    tasks = [(instance, engine, distances, results_cache, refresh) for instance in instances]
+    workers = workers or os.cpu_count()
 
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if ordered:
+            yield from pool.map(batch_task, tasks, chunksize=max(1, len(tasks) // (8 * workers)))
+        else:
+            for future in as_completed([pool.submit(batch_task, task) for task in tasks]):
+                yield future.result()
 
-        for node_to_merge in nodes_to_merge:
 
-            # Recherche de la racine
-            root_to_merge = referents[node_to_merge]
-            while root_to_merge != referents[root_to_merge]:
-                root_to_merge = referents[root_to_merge]
+def main_batch(arguments, results_cache):
+    """
+    runs --batch mode : results printed in input order, or as json lines.
+    returns the number of files that failed.
+    """
+    start = perf_counter()
+    count = failures = 0
 
-            referents[node_to_merge] = root_to_merge
+    for instance, result, error in iter_batch(arguments.instances, arguments.engine, arguments.distances,
+                                              arguments.workers, results_cache, arguments.refresh_cache,
+                                              ordered=not arguments.json):
+        count += 1
+        failures += error is not None
 
+        if arguments.json:
+            record = {"file": instance, "error": error} if error else {"file": instance, "sizes": result}
+            print(json.dumps(record), flush=True)
 
-            if root != root_to_merge:
+        elif error:
+            print(f"{instance}: {error}", file=sys.stderr)
 
-                # Ajout du compte de points dans l'arbre d'identifiant root_to_merge
-                counts[root] += counts[root_to_merge]
+        elif arguments.distances:
+            for distance in arguments.distances:
+                print(f"{instance} {distance}: {result[distance]}")
 
-                # Suppression de l'arbre d'identifiant root_to_merge
-                referents[root_to_merge] = root
-                del counts[root_to_merge]
+        else:
+            print(f"{instance}: {result}")
 
-    return list(number_of_child for number_of_child in counts.values())
+    elapsed = perf_counter() - start
+    print(f"{count} files in {elapsed:.3f}s ({count / (elapsed or 1e-9):.1f} files/s)", file=sys.stderr)
 
+    return failures
 
-# For tests perfs
-def main_perfs(distance, points):
-    return print_components_sizes(distance, points)
 
+# x-------x
+# |  CLI  |
+# x-------x
 
-def main():
+def distances_list(text):
     """
-    ne pas modifier: on charge une instance et on affiche les tailles
+    comma separated distances of --distances, like 0.1,0.05,0.01
     """
-    for instance in argv[1:]:
-        distance, points = load_instance(instance)
-        print_components_sizes(distance, points)
+    try:
+        return [float(distance) for distance in text.split(",")]
+    except ValueError:
+        raise ArgumentTypeError(f"invalid distances list: {text!r}") from None
 
 
-main()
+def main():
+    """
+    on charge chaque instance et on affiche les tailles
+    """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("instances", nargs="*", help=".pts or binary instance files (- for stdin)")
+    parser.add_argument("--engine", choices=ENGINES, default="grid", help="clustering engine")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes, each clustering a horizontal band (grid engine)")
+    parser.add_argument("--distances", type=distances_list, metavar="D1,D2,...",
+                        help="cluster for each of these comma separated distances in one pass, instead of the file's")
+    parser.add_argument("--stats", action="store_true",
+                        help="print phase timings and counters of the sweep engine")
+    parser.add_argument("--history", action="store_true",
+                        help="print single linkage merges (length, points, size) up to the largest distance")
+    parser.add_argument("--cache", action="store_true", help="reuse results stored on disk")
+    parser.add_argument("--cache-dir", default=DEFAULT_DIRECTORY, metavar="DIRECTORY",
+                        help=f"directory of the cache (default: {DEFAULT_DIRECTORY})")
+    parser.add_argument("--cache-size", type=float, default=256, metavar="MB",
+                        help="cache size limit, least recently used results are evicted")
+    parser.add_argument("--cache-labels", action="store_true", help="also store labels in the cache")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="recompute results even if cached, then store them")
+    parser.add_argument("--clear-cache", action="store_true", help="empty the cache first")
+    parser.add_argument("--component-stats", action="store_true",
+                        help="print size, centroid and bounding box of each component (computed by the unions)")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="sort on disk and sweep with bounded memory (instances larger than memory)")
+    parser.add_argument("--batch", action="store_true", help="cluster files in a pool of worker processes")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker processes of --batch (default: all cores)")
+    parser.add_argument("--json", action="store_true",
+                        help="with --batch, print one json line per file as soon as it is done")
+    arguments = parser.parse_args()
+
+    if arguments.batch and (arguments.stats or arguments.history or arguments.out_of_core
+                                        or arguments.component_stats):
+        parser.error("--batch only computes sizes (optionally with --distances)")
+
+    if arguments.batch and "-" in arguments.instances:
+        parser.error("--batch reads files in worker processes, stdin (-) cannot be one of them")
+
+    results_cache = None
+    if arguments.cache or arguments.clear_cache:
+        results_cache = ResultCache(arguments.cache_dir, int(arguments.cache_size * (1 << 20)))
+
+        if arguments.clear_cache:
+            results_cache.clear()
+
+            if not arguments.cache:
+                results_cache = None
+
+    if arguments.batch:
+        if main_batch(arguments, results_cache):
+            sys.exit(1)
+        return
+
+    for instance in arguments.instances:
+
+        if arguments.stats:
+            distance, points = load_instance(instance)
+            stats = SweepStats()
+            print(Clustering.from_components(sweep_cluster(distance, points, stats)).sizes)
+            stats.display()
+
+        elif arguments.history:
+            distance, points = load_instance(instance)
+            for merge in zip(*thresholds.merge_history(max(arguments.distances or [distance]), points)):
+                print(*merge)
+
+        elif arguments.component_stats:
+            stats = cluster(*load_instance(instance), arguments.engine, arguments.jobs, aggregate=True).stats
+            for count, centroid, low, high in zip(stats.counts.tolist(), stats.centroids.tolist(),
+                                                  stats.lows.tolist(), stats.highs.tolist()):
+                print(count, *centroid, *low, *high)
+
+        elif arguments.out_of_core:
+            distance, chunks = open_chunks(instance)
+            print(streaming.external_components_sizes(distance, prefetch(chunks)))
+
+        elif arguments.distances:
+            sizes = instance_sizes_by_distance(instance, arguments.distances, results_cache, arguments.refresh_cache)
+            for distance in arguments.distances:
+                print(f"{distance}: {sizes[distance]}")
+
+        else:
+            print(cluster_instance(instance, arguments.engine, arguments.jobs, results_cache,
+                                   arguments.cache_labels, arguments.refresh_cache).sizes)
+
+
+if __name__ == '__main__':
+    main()
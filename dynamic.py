@@ -0,0 +1,704 @@
+#!/usr/bin/env python3
+"""
+dynamic clustering : points are inserted and deleted by deltas, components
+are kept up to date and the state is saved on disk between deltas.
+
+usage: ./dynamic.py state.npz --init instance.pts
+       ./dynamic.py state.npz delta_1.txt delta_2.txt ...
+
+a delta file has one point per line, prefixed by + (insertion) or - (deletion) :
+
+    + 0.25, 0.5
+    - 0.125, 0.75
+
+insertions only compare new points with the points of the cells around them.
+deletions first try to show, in the cells around the deleted points, that
+their former neighbours are still connected to each other : the component is
+then unchanged. only if this fails is the affected component clustered again,
+and split if needed. other components are never looked at.
+
+the state file also holds the spatial index and the members of each component
+in compact form (sorted keys and offsets) : loading a state only reads arrays,
+and the index of a cell or component is unpacked the first time it is used.
+"""
+
+import os
+import tempfile
+from argparse import ArgumentParser
+
+import numpy as np
+
+import grid
+from incremental import NEIGHBOUR_OFFSETS
+from instances import load_instance, parse_points
+from unionfind import DisjointSet
+
+# Rayon (en cellules) de la première recherche locale autour des points supprimés
+LOCAL_REACH = 1
+
+# Au delà de ce rayon, la composante touchée est entièrement recalculée
+MAX_LOCAL_REACH = 8
+
+# Une fenêtre estimée à plus d'un quart des composantes touchées n'est pas élargie
+WINDOW_SHARE = 4
+
+
+class DynamicClusterer:
+    """
+        Clustering maintenu au fil des insertions et suppressions de points
+        (en dimension 2).
+
+        Chaque point porte une étiquette ; les étiquettes fusionnées lors des
+        insertions sont reliées par un union-find, la composante d'un point est
+        la racine de son étiquette. Une composante coupée par des suppressions
+        reçoit de nouvelles étiquettes pour ses morceaux.
+
+        Exemple :
+
+            clusterer = DynamicClusterer(distance, points)
+            clusterer.apply_delta(insertions, deletions)
+            sizes = clusterer.component_sizes()
+            clusterer.save("state.npz")
+            clusterer = DynamicClusterer.load("state.npz")
+    """
+
+    def __init__(self, distance, points=(), labels=None, capacity=1024, index=None):
+        """
+            index : forme compacte de l'index spatial et des membres, telle
+                    qu'enregistrée par save pour ces points et étiquettes
+                    (calculée si absente)
+        """
+
+        self.distance = distance
+
+        points = plane_points(points)
+        if labels is None:
+            labels = np.unique(grid.components_labels(distance, points), return_inverse=True)[1]
+        labels = np.asarray(labels, dtype=np.int64).reshape(-1)
+
+        # Points (les supprimés restent en place, marqués morts, jusqu'à la sauvegarde)
+        capacity = max(capacity, len(points))
+        self.points = np.empty((capacity, 2), dtype=np.float64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.labels = np.empty(capacity, dtype=np.int64)
+        self.count = 0
+
+        self.alive_count = 0
+
+        # Union-find des étiquettes, effectif de chaque composante (à sa racine,
+        # capacité doublée au besoin comme pour les points)
+        self.components = DisjointSet(0)
+        self.sizes = np.zeros(capacity, dtype=np.int64)
+
+        # Index spatial : cellule -> indices des points vivants
+        self.cells = CompactIndex.build(np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+        # Membres : racine -> indices de ses points (anciens membres, morts ou
+        # partis dans une autre composante, écartés lors d'un recalcul)
+        self.members = CompactIndex.build(np.zeros((0, 1), dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+        if len(points):
+            self._new_labels(int(labels.max()) + 1)
+            self.sizes[:len(self.components)] = np.bincount(labels, minlength=len(self.components))
+            self._store(points, labels, index)
+
+    def __len__(self):
+        return self.alive_count
+
+    # x---------------x
+    # |  Persistance  |
+    # x---------------x
+
+    def save(self, filename):
+        """
+            Enregistre les points vivants, leur composante et la forme compacte
+            de l'index spatial et des membres (écriture atomique).
+
+            Les points supprimés sont oubliés, les étiquettes renumérotées,
+            les points rangés par cellule.
+        """
+
+        alive = np.flatnonzero(self.alive[:self.count])
+        labels = np.unique(self.components.find_all(self.labels[alive]), return_inverse=True)[1]
+
+        cells = CompactIndex.build(self._points_cells(self.points[alive]), np.arange(len(alive)))
+        points, labels = self.points[alive][cells.values], labels[cells.values]
+        members = CompactIndex.build(labels.reshape(-1, 1), np.arange(len(alive)))
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as state_file:
+            np.savez(state_file, distance=self.distance, points=points, labels=labels,
+                     cell_keys=cells.keys, cell_starts=cells.starts,
+                     member_keys=members.keys, member_starts=members.starts, member_points=members.values)
+
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """ Etat enregistré par save : ni le clustering ni l'index ne sont recalculés. """
+
+        with np.load(filename) as state:
+            index = None
+            if "cell_keys" in state:
+                index = (CompactIndex(state["cell_keys"], state["cell_starts"], np.arange(len(state["points"]))),
+                         CompactIndex(state["member_keys"], state["member_starts"], state["member_points"]))
+
+            return cls(float(state["distance"]), state["points"], state["labels"], index=index)
+
+    # x----------x
+    # |  Deltas  |
+    # x----------x
+
+    def apply_delta(self, insertions=(), deletions=()):
+        """ Supprime puis insère des points (tableaux (n, 2) de coordonnées). """
+
+        self.delete_points(deletions)
+        self.insert_points(insertions)
+
+    def insert_points(self, batch):
+        """
+            Insère un lot de points et met à jour les composantes.
+
+            Seuls les points des cellules voisines des nouveaux points
+            sont comparés aux nouveaux points.
+        """
+
+        batch = plane_points(batch)
+        if not len(batch):
+            return
+
+        news, olds = self._close_old_points(batch)
+
+        # Union-find local : nouveaux points puis composantes existantes touchées
+        touched = np.unique(self.components.find_all(self.labels[olds]))
+        local = DisjointSet(len(batch) + len(touched))
+
+        for firsts, seconds in grid.iter_close_pairs(self.distance, batch):
+            local.union_pairs(firsts, seconds)
+        local.union_pairs(news, len(batch) + np.searchsorted(touched, self.components.find_all(self.labels[olds])))
+
+        groups = np.unique(local.find_all(np.arange(len(local))), return_inverse=True)[1]
+
+        # Etiquette de chaque groupe : composantes touchées fusionnées, ou nouvelle étiquette
+        group_labels = np.full(groups.max() + 1, -1, dtype=np.int64)
+
+        for group, root in zip(groups[len(batch):].tolist(), touched.tolist()):
+            if group_labels[group] < 0:
+                group_labels[group] = root
+            else:
+                group_labels[group] = self._merge(group_labels[group], root)
+
+        fresh = np.flatnonzero(group_labels < 0)
+        group_labels[fresh] = self._new_labels(len(fresh))
+
+        labels = group_labels[groups[:len(batch)]]
+        np.add.at(self.sizes, labels, 1)
+
+        self._store(batch, labels)
+
+    def delete_points(self, batch):
+        """
+            Supprime un point de mêmes coordonnées pour chaque ligne du lot
+            et met à jour les composantes touchées.
+
+            Les morceaux détachés sont d'abord cherchés autour des points
+            supprimés, dans un rayon doublé tant que c'est indécis ; au delà
+            de MAX_LOCAL_REACH, ou si la fenêtre devient trop grande devant les
+            composantes touchées, celles-ci sont entièrement recalculées.
+
+            ValueError si un point à supprimer est absent.
+        """
+
+        batch = plane_points(batch)
+        if not len(batch):
+            return
+
+        deleted = self._unindex(batch)
+        self.alive[deleted] = False
+        self.alive_count -= len(deleted)
+
+        roots = self.components.find_all(self.labels[deleted])
+        np.subtract.at(self.sizes, roots, 1)
+
+        # Les composantes entièrement supprimées n'ont plus rien à couper
+        emptied = np.unique(roots[self.sizes[roots] == 0])
+        self.members.fetch(emptied)
+        for root in emptied.tolist():
+            del self.members[root]
+
+        pending = deleted[self.sizes[roots] > 0]
+        reach = LOCAL_REACH
+
+        # Points par cellule occupée, pour estimer la taille de la fenêtre
+        density = len(self) / max(len(self.cells), 1)
+
+        while len(pending) and reach <= MAX_LOCAL_REACH:
+            pending_roots = np.unique(self.components.find_all(self.labels[pending]))
+            window_size = len(pending) * (2 * reach + 1) ** 2 * density
+
+            if reach > LOCAL_REACH and window_size * WINDOW_SHARE > self.sizes[pending_roots].sum():
+                break
+
+            pending = self._detach_pieces(pending, reach)
+            reach *= 2
+
+        if len(pending):
+            self._split(np.unique(self.components.find_all(self.labels[pending])))
+
+    def component_sizes(self):
+        """ Tailles triées (décroissantes) des composantes des points vivants. """
+
+        labels = np.arange(len(self.components))
+        sizes = self.sizes[:len(labels)][self.components.roots() == labels]
+
+        return sorted(sizes[sizes > 0].tolist(), reverse=True)
+
+    # x---------------x
+    # |  Suppression  |
+    # x---------------x
+
+    def _detach_pieces(self, deleted, reach):
+        """
+            Détache les morceaux coupés par la suppression des points deleted,
+            en ne regardant que les points à moins de reach cellules d'eux.
+
+            Les points supprimés sont regroupés par voisinage. Dans la fenêtre,
+            une composante locale sans point sur le bord de la fenêtre est une
+            composante complète (fermée). La composante d'origine privée de ses
+            morceaux fermés reste connexe si chaque groupe ne touche qu'une
+            composante locale ouverte et si aucun morceau fermé ne touche deux
+            groupes : un chemin passant par les points supprimés peut alors
+            être remplacé par un chemin dans la composante locale ouverte.
+
+            Les morceaux fermés des composantes ainsi décidées reçoivent de
+            nouvelles étiquettes. Retourne les points supprimés des composantes
+            indécises.
+        """
+
+        roots = self.components.find_all(self.labels[deleted])
+        groups = np.unique(grid.components_labels(self.distance, self.points[deleted]), return_inverse=True)[1]
+
+        # Fenêtre : cellules à moins de reach cellules d'un point supprimé
+        window, inner_cells = window_cells(self._points_cells(self.points[deleted]), reach)
+        self.cells.fetch(window)
+
+        around, inner = [], []
+        for cell, closed in zip(map(tuple, window.tolist()), inner_cells.tolist()):
+            members = self.cells.get(cell, ())
+            if members:
+                around.extend(members)
+                inner.extend([closed] * len(members))
+
+        around, inner = np.array(around, dtype=np.int64), np.array(inner, dtype=bool)
+        kept = np.isin(self.components.find_all(self.labels[around]), roots)
+        around, inner = around[kept], inner[kept]
+
+        local = np.unique(grid.components_labels(self.distance, self.points[around]), return_inverse=True)[1]
+        is_open = np.zeros(len(around), dtype=bool)
+        is_open[local[~inner]] = True
+
+        # Couples (groupe de points supprimés, composante locale voisine)
+        points = np.concatenate((self.points[deleted], self.points[around]))
+        touching = []
+
+        for firsts, seconds in grid.iter_close_pairs(self.distance, points):
+            crossing = (firsts < len(deleted)) != (seconds < len(deleted))
+            lows, highs = np.minimum(firsts, seconds)[crossing], np.maximum(firsts, seconds)[crossing]
+            touching.append(np.column_stack((groups[lows], local[highs - len(deleted)])))
+
+        touching = np.unique(np.concatenate(touching), axis=0) if touching else np.zeros((0, 2), dtype=np.int64)
+        touching_groups, touching_locals = touching[:, 0], touching[:, 1]
+
+        # Indécis : groupe touchant deux composantes ouvertes, morceau fermé touchant deux groupes
+        opened = is_open[touching_locals]
+        undecided = np.bincount(touching_groups[opened], minlength=len(deleted)) > 1
+
+        closed_groups = touching_groups[~opened]
+        closed_locals = touching_locals[~opened]
+        shared = np.bincount(closed_locals, minlength=len(around)) > 1
+        undecided[closed_groups[shared[closed_locals]]] = True
+
+        undecided_roots = np.unique(roots[undecided[groups]])
+
+        # Morceaux fermés des composantes décidées
+        group_roots = np.zeros(len(deleted), dtype=np.int64)
+        group_roots[groups] = roots
+        decided = ~np.isin(group_roots[closed_groups], undecided_roots)
+        pieces, pieces_roots = closed_locals[decided], group_roots[closed_groups[decided]]
+
+        if len(pieces):
+            piece_labels = np.full(len(around), -1, dtype=np.int64)
+            piece_labels[pieces] = self._new_labels(len(pieces))
+
+            moved = piece_labels[local] >= 0
+            self.labels[around[moved]] = piece_labels[local[moved]]
+            self._index_members(around[moved], piece_labels[local[moved]])
+
+            pieces_sizes = np.bincount(local[moved], minlength=len(around))[pieces]
+            self.sizes[piece_labels[pieces]] = pieces_sizes
+            np.subtract.at(self.sizes, pieces_roots, pieces_sizes)
+
+        return deleted[np.isin(roots, undecided_roots)]
+
+    def _split(self, roots):
+        """
+            Recalcule les composantes de racines roots et les coupe en morceaux
+            si besoin : dans chacune, le plus grand morceau garde ses
+            étiquettes, les autres en reçoivent de nouvelles.
+        """
+
+        # Membres actuels, d'après l'index des membres (sans doublons : un point
+        # parti dans une autre composante puis revenu y figure deux fois)
+        self.members.fetch(roots)
+        members = np.sort(np.array([member for root in roots.tolist() for member in self.members.pop(root)],
+                                   dtype=np.int64))
+        members = members[np.r_[True, members[1:] != members[:-1]] & self.alive[members]]
+        members_roots = self.components.find_all(self.labels[members])
+        kept = np.isin(members_roots, roots)
+        members, members_roots = members[kept], members_roots[kept]
+
+        # Deux composantes distinctes ne sont jamais reliées : un seul calcul suffit
+        parts = np.unique(grid.components_labels(self.distance, self.points[members]), return_inverse=True)[1]
+        parts_sizes = np.bincount(parts)
+
+        parts_roots = np.zeros(len(parts_sizes), dtype=np.int64)
+        parts_roots[parts] = members_roots
+
+        # Plus grand morceau de chaque composante
+        order = np.lexsort((-parts_sizes, parts_roots))
+        largest = order[np.r_[True, parts_roots[order][1:] != parts_roots[order][:-1]]]
+        others = np.setdiff1d(np.arange(len(parts_sizes)), largest)
+
+        self.sizes[parts_roots[largest]] = parts_sizes[largest]
+
+        part_labels = parts_roots.copy()
+        part_labels[others] = self._new_labels(len(others))
+
+        moved = part_labels[parts] != members_roots
+        self.labels[members[moved]] = part_labels[parts[moved]]
+        self.sizes[part_labels[others]] = parts_sizes[others]
+
+        self._index_members(members, part_labels[parts])
+
+    # x------------x
+    # |  Stockage  |
+    # x------------x
+
+    def _new_labels(self, count):
+        """ Nouvelles étiquettes isolées, vides. """
+
+        first = self.components.add(count)
+
+        if len(self.components) > len(self.sizes):
+            sizes = np.zeros(max(len(self.components), 2 * len(self.sizes)), dtype=np.int64)
+            sizes[:first] = self.sizes[:first]
+            self.sizes = sizes
+
+        return np.arange(first, first + count, dtype=np.int64)
+
+    def _merge(self, first, second):
+        """ Réunit deux composantes (racines), retourne la racine commune. """
+
+        size = self.sizes[first] + self.sizes[second]
+        root = self.components.union(first, second)
+        self.sizes[root] = size
+
+        # La plus courte liste de membres rejoint la plus longue
+        self.members.fetch(np.array([first, second]))
+        members = sorted((self.members.pop(first, []), self.members.pop(second, [])), key=len)
+        members[1].extend(members[0])
+        self.members[root] = members[1]
+
+        return root
+
+    def _index_members(self, points, roots):
+        """ Ajoute des points (indices) aux membres de leurs racines. """
+
+        order = np.argsort(roots, kind="stable")
+        sorted_roots = roots[order]
+        starts = np.flatnonzero(np.r_[True, sorted_roots[1:] != sorted_roots[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        points = points[order].tolist()
+
+        self.members.fetch(sorted_roots[starts])
+        for root, start, end in zip(sorted_roots[starts].tolist(), starts.tolist(), ends.tolist()):
+            self.members.setdefault(root, []).extend(points[start:end])
+
+    def _store(self, batch, labels, index=None):
+        """
+            Ajoute des points vivants étiquetés à la suite des points et à l'index.
+
+            Les premiers points stockés forment directement l'index compact
+            (index s'il est donné), sans boucle sur les cellules ni les composantes.
+        """
+
+        first = self.count
+        needed = first + len(batch)
+
+        if needed > len(self.points):
+            capacity = max(needed, 2 * len(self.points))
+            self.points = np.concatenate((self.points[:first], np.empty((capacity - first, 2))))
+            self.alive = np.concatenate((self.alive[:first], np.zeros(capacity - first, dtype=bool)))
+            self.labels = np.concatenate((self.labels[:first], np.empty(capacity - first, dtype=np.int64)))
+
+        self.points[first:needed] = batch
+        self.alive[first:needed] = True
+        self.labels[first:needed] = labels
+        self.count = needed
+        self.alive_count += len(batch)
+
+        roots = self.components.find_all(np.asarray(labels))
+
+        if not first:
+            self.cells, self.members = index or (CompactIndex.build(self._points_cells(batch), np.arange(needed)),
+                                                 CompactIndex.build(roots.reshape(-1, 1), np.arange(needed)))
+            return
+
+        self._index_members(np.arange(first, needed), roots)
+
+        cells, order, starts, counts = self._group_cells(batch)
+        order = (order + first).tolist()
+
+        self.cells.fetch(cells)
+        for cell, start, count in zip(map(tuple, cells.tolist()), starts.tolist(), counts.tolist()):
+            self.cells.setdefault(cell, []).extend(order[start:start + count])
+
+    def _unindex(self, batch):
+        """
+            Retire de l'index un point vivant de mêmes coordonnées pour chaque
+            ligne du lot, retourne leurs indices.
+
+            Tous les points sont trouvés avant la moindre modification : si
+            l'un manque (ValueError), l'index est inchangé.
+        """
+
+        deleted, found = [], set()
+        cells = self._points_cells(batch)
+        self.cells.fetch(cells)
+
+        for (x, y), (cell_x, cell_y) in zip(batch.tolist(), cells.tolist()):
+            cell = self.cells.get((cell_x, cell_y), [])
+            match = next((member for member in cell if member not in found
+                          and self.points[member, 0] == x and self.points[member, 1] == y), None)
+
+            if match is None:
+                raise ValueError(f"point ({x}, {y}) to delete is not in the clustering")
+
+            found.add(match)
+            deleted.append((cell, match))
+
+        for cell, match in deleted:
+            cell.remove(match)
+
+        return np.array([match for _, match in deleted], dtype=np.int64)
+
+    def _close_old_points(self, batch):
+        """
+            Couples (nouveau point, point existant) à distance, le nouveau
+            point étant repéré par son indice dans le lot.
+        """
+
+        cells, order, starts, counts = self._group_cells(batch)
+        news, olds = [], []
+
+        self.cells.fetch((cells[:, np.newaxis] + np.array(NEIGHBOUR_OFFSETS)).reshape(-1, 2))
+
+        members, counts_around = [], []
+        for cell_x, cell_y in cells.tolist():
+            before = len(members)
+            for dx, dy in NEIGHBOUR_OFFSETS:
+                members.extend(self.cells.get((cell_x + dx, cell_y + dy), ()))
+            counts_around.append(len(members) - before)
+
+        members = np.array(members, dtype=np.int64)
+        counts_around = np.array(counts_around, dtype=np.int64)
+        starts_around = np.cumsum(counts_around) - counts_around
+
+        for part in grid.iter_batches(counts * counts_around):
+            new, old = grid.expand_pairs(starts[part], counts[part], starts_around[part], counts_around[part])
+            new, old = order[new], members[old]
+
+            dx = self.points[old, 0] - batch[new, 0]
+            dy = self.points[old, 1] - batch[new, 1]
+            accepted = dx*dx + dy*dy <= self.distance * self.distance
+
+            news.append(new[accepted])
+            olds.append(old[accepted])
+
+        if not news:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        return np.concatenate(news), np.concatenate(olds)
+
+    def _group_cells(self, batch):
+        """ Cellules occupées par le lot, ordre des points par cellule, début et nombre par cellule. """
+
+        batch_cells = self._points_cells(batch)
+        order = np.lexsort(batch_cells.T[::-1])
+        cells, starts, counts = np.unique(batch_cells[order], axis=0, return_index=True, return_counts=True)
+
+        return cells, order, starts, counts
+
+    def _points_cells(self, points):
+        """ Cellule (de côté distance) de chaque point. """
+
+        return np.floor_divide(points, self.distance).astype(np.int64)
+
+
+class CompactIndex(dict):
+    """
+        Dictionnaire clef -> liste d'indices de points, déplié paresseusement
+        depuis une forme compacte (CSR) : clefs (lignes d'entiers) triées,
+        début des indices de chaque clef, indices rangés par clef.
+
+        Une clef de la forme compacte n'entre dans le dictionnaire qu'au
+        premier fetch la concernant : toute lecture ou écriture de clefs doit
+        être précédée d'un fetch de ces clefs. Les clefs sont des tuples
+        (ou des entiers pour des clefs d'une seule colonne).
+
+        Exemple :
+
+            index = CompactIndex.build(keys, values)
+            index.fetch(some_keys)
+            index.setdefault(key, []).append(value)
+    """
+
+    def __init__(self, keys, starts, values):
+        super().__init__()
+
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.int64)
+
+        # Clefs encodées (triées) pour les recherches, bornes des clefs connues
+        self.encode = grid.cell_encoder(self.keys) if len(self.keys) else None
+        self.encoded = self.encode(self.keys) if len(self.keys) else None
+        self.lows, self.highs = (self.keys.min(axis=0), self.keys.max(axis=0)) if len(self.keys) else (None, None)
+
+        self.fetched = np.zeros(len(self.keys), dtype=bool)
+        self.unfetched = len(self.keys)
+
+    @classmethod
+    def build(cls, keys, values):
+        """ Forme compacte de la clef keys[i] (lignes) de chaque valeur values[i]. """
+
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        if not len(keys):
+            return cls(keys, np.zeros(1, dtype=np.int64), values)
+
+        encoded = grid.cell_encoder(keys)(keys)
+        order = np.argsort(encoded, kind="stable")
+        starts = np.flatnonzero(np.r_[True, encoded[order][1:] != encoded[order][:-1]])
+
+        return cls(keys[order[starts]], np.r_[starts, len(keys)], values[order])
+
+    def __len__(self):
+        return super().__len__() + self.unfetched
+
+    def fetch(self, keys):
+        """ Déplie dans le dictionnaire les clefs (lignes, ou entiers) de la forme compacte. """
+
+        if not self.unfetched or not len(keys):
+            return
+
+        keys = np.asarray(keys, dtype=np.int64).reshape(len(keys), -1)
+        keys = keys[((keys >= self.lows) & (keys <= self.highs)).all(axis=1)]
+        if not len(keys):
+            return
+
+        encoded = self.encode(keys)
+        slots = np.minimum(np.searchsorted(self.encoded, encoded), len(self.encoded) - 1)
+        slots = np.unique(slots[self.encoded[slots] == encoded])
+        slots = slots[~self.fetched[slots]]
+
+        self.fetched[slots] = True
+        self.unfetched -= len(slots)
+
+        single = self.keys.shape[1] == 1
+        for key, start, end in zip(self.keys[slots].tolist(), self.starts[slots].tolist(),
+                                   self.starts[slots + 1].tolist()):
+            self[key[0] if single else tuple(key)] = self.values[start:end].tolist()
+
+
+def plane_points(points):
+    """
+    (n, 2) float array of given points, ValueError if they are not in dimension 2.
+    """
+    points = np.asarray(points, dtype=np.float64)
+
+    if not points.size:
+        return points.reshape(0, 2)
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError(f"dynamic clustering only handles points in dimension 2, got shape {points.shape}")
+
+    return points
+
+
+def window_cells(cells, reach):
+    """
+    cells at most reach cells away (in each axis) from given (n, 2) cells.
+    returns these cells, and whether all their neighbour cells are in the
+    window too (inner cells).
+    """
+    steps = np.arange(-reach, reach + 1)
+    offsets = np.column_stack((np.repeat(steps, len(steps)), np.tile(steps, len(steps))))
+    window = np.unique((cells[:, np.newaxis] + offsets).reshape(-1, 2), axis=0)
+
+    # Clefs croissantes des cellules de la fenêtre (et de leur bord)
+    low = window.min(axis=0) - 1
+    width = window[:, 1].max() - low[1] + 2
+    keys = (window[:, 0] - low[0]) * width + window[:, 1] - low[1]
+
+    neighbours = window[:, np.newaxis] + np.array(NEIGHBOUR_OFFSETS)
+    neighbours_keys = (neighbours[..., 0] - low[0]) * width + neighbours[..., 1] - low[1]
+    inner = np.isin(neighbours_keys, keys).all(axis=1)
+
+    return window, inner
+
+
+def load_delta(filename):
+    """
+    reads a delta file : returns (insertions, deletions) as (n, 2) float arrays.
+    """
+    with open(filename, "r", encoding="utf-8") as delta_file:
+        lines = [line.strip() for line in delta_file]
+
+    bodies = {"+": [], "-": []}
+
+    for line in lines:
+        if not line:
+            continue
+        if line[0] not in bodies:
+            raise ValueError(f"delta line {line!r} does not start with + or -")
+        bodies[line[0]].append(line[1:])
+
+    return tuple(plane_points(parse_points("\n".join(bodies[sign]))) for sign in "+-")
+
+
+def main():
+    """
+    applies each given delta to the saved state and prints sorted sizes.
+    """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("state", help="state file (.npz)")
+    parser.add_argument("deltas", nargs="*", help="delta files, applied in order")
+    parser.add_argument("--init", metavar="INSTANCE", help="start a new state from this instance")
+    arguments = parser.parse_args()
+
+    if arguments.init:
+        clusterer = DynamicClusterer(*load_instance(arguments.init))
+        print(clusterer.component_sizes())
+    else:
+        clusterer = DynamicClusterer.load(arguments.state)
+
+    for delta in arguments.deltas:
+        clusterer.apply_delta(*load_delta(delta))
+        print(clusterer.component_sizes())
+
+    clusterer.save(arguments.state)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
 """
 points (any dimension).
+
+many points are better stored in one PointArray than as Point objects.
 """
 from math import sqrt
+
+import numpy as np
+
 from geo.quadrant import Quadrant
 
 
@@ -19,6 +24,8 @@ class Point:
 
     distance = point1.distance_to(point2)
     """
+    __slots__ = ("coordinates",)
+
     def __init__(self, coordinates):
         """
         build new point using an array of coordinates.
@@ -104,3 +111,122 @@ class Point:
         lexicographical comparison
         """
         return self.coordinates < other.coordinates
+
+
+class PointArray:
+    """
+    many points of same dimension, stored in one contiguous (n, dimension)
+    float array. operations apply to all points at once.
+
+    for example:
+
+    - create an array of points:
+
+    points = PointArray([[0, 0], [2, 5], [1, 1]])
+
+    - distances from all points to a point:
+
+    distances = points.distances_to(Point([1, 2]))
+
+    - translate all points:
+
+    moved = points + Point([1, 0])
+
+    tycat displays it directly.
+    """
+    __slots__ = ("coordinates",)
+
+    def __init__(self, coordinates):
+        """
+        build array of points from (n, dimension) coordinates.
+        """
+        self.coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+        if self.coordinates.ndim != 2: # no points
+            self.coordinates = self.coordinates.reshape(-1, 2)
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        build array from an iterable on Point.
+        """
+        return cls([point.coordinates for point in points])
+
+    def copy(self):
+        """
+        return copy of given points.
+        """
+        return PointArray(self.coordinates.copy())
+
+    def distances_to(self, other):
+        """
+        euclidean distance from each point to other point.
+        """
+        diff = self.coordinates - np.asarray(other.coordinates, dtype=np.float64)
+        return np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+    def translate(self, vector):
+        """
+        return points translated by vector (a Point or coordinates).
+        """
+        return PointArray(self.coordinates + np.asarray(getattr(vector, "coordinates", vector)))
+
+    def scale(self, factor):
+        """
+        return points multiplied by scalar factor (or by factor for each coordinate).
+        """
+        return PointArray(self.coordinates * factor)
+
+    def bounding_quadrant(self):
+        """
+        return min quadrant containing all points, computed in bulk.
+        """
+        if not len(self.coordinates):
+            return Quadrant.empty_quadrant(self.coordinates.shape[1])
+
+        return Quadrant(self.coordinates.min(axis=0).tolist(), self.coordinates.max(axis=0).tolist())
+
+    def __add__(self, other):
+        """
+        translation by a point.
+        """
+        return self.translate(other)
+
+    def __sub__(self, other):
+        """
+        translation by opposite of a point.
+        """
+        return PointArray(self.coordinates - np.asarray(other.coordinates))
+
+    def __mul__(self, factor):
+        """
+        multiplication by scalar operator. (useful for scaling)
+        """
+        return self.scale(factor)
+
+    def __truediv__(self, factor):
+        """
+        division by scalar operator. (useful for scaling)
+        """
+        return PointArray(self.coordinates / factor)
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def __getitem__(self, index):
+        """
+        Point at integer index, PointArray for slices and index arrays.
+        """
+        if isinstance(index, (int, np.integer)):
+            return Point(self.coordinates[index].tolist())
+
+        return PointArray(self.coordinates[index])
+
+    def __iter__(self):
+        for coordinates in self.coordinates.tolist():
+            yield Point(coordinates)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.coordinates if dtype is None else self.coordinates.astype(dtype)
+
+    def __repr__(self):
+        return "PointArray(" + repr(self.coordinates.tolist()) + ")"
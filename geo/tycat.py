@@ -1,12 +1,28 @@
 """
 graphical display system.
 save objects as svg files and view them in terminology
+
+svg is streamed to the file while objects are traversed. coordinate arrays
+(numpy arrays of shape (n, 2), or objects convertible to one such as
+geo.point.PointArray) are bounded and written in vectorized passes. above a
+budget of array points, each array is drawn as a density raster : one square
+per occupied cell, more opaque where the cell holds more points.
 """
 import os
 import getpass
+import shutil
+import tempfile
 from itertools import cycle
+from math import log1p
+
+import numpy as np
+
 from geo.quadrant import Quadrant
 
+POINT_BUDGET = 100000 # array points drawn one by one, above it arrays are rasterized
+RASTER_SHAPE = (400, 300) # cells of the density raster
+WRITE_CHUNK = 1 << 16 # array points formatted at a time
+
 
 class Displayer:
     """
@@ -68,7 +84,7 @@ class Displayer:
         svg_file.write("</svg>\n")
         svg_file.close()
 
-def tycat(*things):
+def tycat(*things, point_budget=POINT_BUDGET):
     """
     graphically displays all objects given.
     each argument will be displayed in a different color.
@@ -77,7 +93,9 @@ def tycat(*things):
         - each object either implements
             * bounding_quadrant
             * svg_content
-        or is an iterable on things implementing it.
+        or is an iterable on things implementing it,
+        or is an array of points (see module documentation).
+    above point_budget array points, arrays are drawn as density rasters.
     """
     print("[", Displayer.file_count, "]")
 
@@ -90,51 +108,162 @@ def tycat(*things):
     filename = "{}/{}.svg".format(directory, str(Displayer.file_count).zfill(5))
     Displayer.file_count += 1
 
-    size, svg_strings = compute_displays(things)
-    try:
-        display = Displayer(size)
-    except ValueError:
+    if not write_svg(filename, things, point_budget):
         print("displaying image {} failed : it is flat".format(Displayer.file_count-1))
         return
 
-    svg_file = display.open_svg(filename)
-    for string in svg_strings:
-        svg_file.write(string)
-    display.close_svg(svg_file)
     os.system("tycat {}".format(filename))
 
 
-def compute_displays(things):
+def tycat_components(points, labels, point_budget=POINT_BUDGET):
     """
-    compute bounding quadrant and svg strings for all things to display.
+    displays a clustering : points (array (n, 2)) colored by component label.
+    """
+    points = np.asarray(points)
+    colors = np.asarray(labels) % len(Displayer.svg_colors)
+    used = int(colors.max()) + 1 if len(colors) else 0
+
+    tycat(*(points[colors == color] for color in range(used)), point_budget=point_budget)
+
+
+def write_svg(filename, things, point_budget=POINT_BUDGET):
+    """
+    writes svg file displaying all things, each in its color.
+    the body is streamed to a temporary file while bounds are computed,
+    then copied after the header.
+    returns False if the image is flat.
+    """
+    things = [as_points(thing) for thing in things]
+    quadrant, count = arrays_bounds(things)
+    raster = raster_grid(quadrant) if count > point_budget else None
+
+    with tempfile.TemporaryFile("w+") as body:
+        for color, thing in zip(cycle(Displayer.svg_colors), things):
+            body.write('<g fill="{}" stroke="{}">\n'.format(color, color))
+            quadrant.update(write_display(body, thing, raster))
+            body.write('</g>\n')
+
+        try:
+            display = Displayer(quadrant)
+        except ValueError:
+            return False
+
+        body.seek(0)
+        svg_file = display.open_svg(filename)
+        shutil.copyfileobj(body, svg_file)
+        display.close_svg(svg_file)
+
+    return True
+
+
+def write_display(svg_file, thing, raster=None):
+    """
+    writes svg strings for one thing (and all it's content), iteratively.
+    returns bounding quadrant of objects (arrays given directly excepted).
     """
     quadrant = Quadrant.empty_quadrant(2)
-    strings = []
-    for color, thing in zip(cycle(iter(Displayer.svg_colors)), things):
-        strings.append('<g fill="{}" stroke="{}">\n'.format(color, color))
-        inner_quadrant, inner_strings = compute_display(thing)
-        quadrant.update(inner_quadrant)
-        strings.extend(inner_strings)
-        strings.append('</g>\n')
+    iterators = [iter((thing,))]
+
+    while iterators:
+        current = next(iterators[-1], iterators)
+        if current is iterators: # exhausted
+            iterators.pop()
+            continue
+
+        if current is not thing:
+            current = as_points(current)
+
+        if isinstance(current, np.ndarray):
+            if current is not thing:
+                quadrant.update(array_quadrant(current))
+            write_points(svg_file, current, raster)
+            continue
+
+        try:
+            iterators.append(iter(current))
+        except TypeError:
+            # we cannot iterate on it
+            svg_file.write(current.svg_content())
+            quadrant.update(current.bounding_quadrant())
+
+    return quadrant
+
+
+# arrays of points
+
+def as_points(thing):
+    """
+    (n, 2) array of thing if it is an array of points, thing itself otherwise.
+    """
+    if isinstance(thing, np.ndarray) or hasattr(thing, "__array__"):
+        points = np.asarray(thing)
+        if points.ndim == 2 and points.shape[1] == 2:
+            return points
 
-    return (quadrant, strings)
+    return thing
 
-def compute_display(thing):
+
+def array_quadrant(points):
+    """
+    bounding quadrant of (n, 2) array, in one vectorized pass.
     """
-    return bounding quadrant and svg strings for one thing (and all it's content)
+    if not len(points):
+        return Quadrant.empty_quadrant(2)
+
+    return Quadrant(points.min(axis=0).tolist(), points.max(axis=0).tolist())
+
+
+def arrays_bounds(things):
+    """
+    bounding quadrant and total count of points of things given as arrays.
     """
     quadrant = Quadrant.empty_quadrant(2)
-    strings = []
-    try:
-        iterator = iter(thing)
-        for subthing in iterator:
-            inner_quadrant, inner_strings = compute_display(subthing)
-            strings.extend(inner_strings)
-            quadrant.update(inner_quadrant)
-
-    except TypeError:
-        # we cannot iterate on it
-        strings.append(thing.svg_content())
-        quadrant.update(thing.bounding_quadrant())
-
-    return quadrant, strings
+    count = 0
+
+    for thing in things:
+        if isinstance(thing, np.ndarray):
+            quadrant.update(array_quadrant(thing))
+            count += len(thing)
+
+    return quadrant, count
+
+
+def raster_grid(quadrant):
+    """
+    origin and cell sizes of density raster covering quadrant.
+    """
+    origin, end = (np.array(limits, dtype=np.float64) for limits in quadrant.get_arrays())
+    cells = (end - origin) / RASTER_SHAPE
+    cells[cells <= 0] = cells.max() if cells.max() > 0 else 1.0
+
+    return origin, cells
+
+
+def write_points(svg_file, points, raster=None):
+    """
+    writes array points one by one, or as density raster squares.
+    """
+    if raster is None:
+        for start in range(0, len(points), WRITE_CHUNK):
+            svg_file.writelines(
+                '<use xlink:href="#c" x="{}" y="{}"/>\n'.format(x, y)
+                for x, y in points[start:start + WRITE_CHUNK].tolist()
+            )
+        return
+
+    if not len(points):
+        return
+
+    origin, sizes = raster
+    cells, counts = np.unique(np.floor((points - origin) / sizes).astype(np.int64),
+                              axis=0, return_counts=True)
+
+    corners = origin + cells * sizes
+    scale = log1p(counts.max())
+    opacities = 0.15 + 0.85 * np.log1p(counts) / scale if scale else np.ones(len(counts))
+
+    svg_file.writelines(
+        '<rect x="{}" y="{}" width="{}" height="{}" fill-opacity="{:.2f}" stroke="none"/>\n'.format(
+            x, y, sizes[0], sizes[1], opacity)
+        for (x, y), opacity in zip(corners.tolist(), opacities.tolist())
+    )
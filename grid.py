@@ -0,0 +1,455 @@
+"""
+grid hashing clustering engine, in any dimension.
+
+points are hashed into cells of side distance : two points at distance are
+always in the same cell or in adjacent ones. candidate pairs between each
+occupied cell and its neighbour cells are checked by batches with array
+operations, accepted pairs are then merged by an array based union-find.
+
+crowded instances are first collapsed into small cells of side
+distance / sqrt(dimension), one node per occupied cell (collapsed_cluster).
+
+in high dimension, when neighbour offsets outnumber occupied cells, occupied
+cells are compared with each other by blocks instead of walking every offset.
+"""
+
+from itertools import product
+
+import numpy as np
+
+from unionfind import DisjointSet
+
+# Nombre maximal de couples candidats vérifiés en une fois
+BATCH_SIZE = 1 << 20
+
+# Au delà de ce nombre moyen de candidats par point, les cellules denses sont regroupées
+DENSE_PAIRS_PER_POINT = 32
+
+# Au delà de ce nombre de couples, deux petites cellules sont comparées par blocs
+LARGE_CELL_PAIR = 1 << 12
+
+# Marge garantissant que deux points d'une même petite cellule sont à bonne distance
+SMALL_CELL_MARGIN = 1 - 1e-9
+
+
+def components_sizes(distance, points):
+    """
+        Tailles triées (décroissantes) des composantes connexes.
+
+        Paramètres:
+        - distance : réel positif représentant une distance
+        - points : tableau (n, dimension) ou séquence de tuples de coordonnées
+
+        Post-conditions :
+        - même résultat que connectes.print_components_sizes (en dimension 2)
+        - les points ne sont pas modifiés
+    """
+
+    return cluster(distance, points).component_sizes()
+
+
+def components_labels(distance, points):
+    """
+    root of the component of each point (indices in given points order).
+    """
+    return cluster(distance, points).roots()
+
+
+def cluster(distance, points, aggregate=False):
+    """
+        Union-find de tous les points, fusionnés selon chaque couple proche.
+
+        Si les cellules sont très peuplées, les points sont d'abord regroupés
+        en petites cellules (voir collapsed_cluster).
+
+        aggregate : les unions tiennent à jour les agrégats des composantes
+                    (voir DisjointSet.component_stats)
+    """
+
+    points = as_points(points)
+    if not len(points):
+        return DisjointSet(0, points if aggregate else None)
+
+    hashed = hash_cells(distance, points)
+    counts = hashed[4]
+
+    if np.dot(counts, counts) > DENSE_PAIRS_PER_POINT * len(points):
+        return collapsed_cluster(distance, points, aggregate)
+
+    components = DisjointSet(len(points), points if aggregate else None)
+    for firsts, seconds in iter_close_pairs(distance, points, hashed):
+        components.union_pairs(firsts, seconds)
+
+    return components
+
+
+def as_points(points):
+    """
+    (n, dimension) float array of given points (dimension 2 if there are none).
+    """
+    points = np.asarray(points, dtype=np.float64)
+
+    if points.ndim != 2:
+        points = points.reshape(len(points), -1) if len(points) else points.reshape(0, 2)
+
+    return points
+
+
+def squared_distances(points, firsts, seconds):
+    """
+        Carrés des distances entre points[firsts] et points[seconds].
+
+        Les carrés des écarts sont sommés dans l'ordre des coordonnées,
+        comme connectes.is_at_distance en dimension 2.
+    """
+
+    total = np.zeros(len(firsts))
+
+    for axis in range(points.shape[1]):
+        diff = points[seconds, axis] - points[firsts, axis]
+        total += diff * diff
+
+    return total
+
+
+# x---------x
+# |  Cells  |
+# x---------x
+
+def half_neighbourhood(dimension):
+    """
+        Décalages vers les cellules voisines (dont la cellule elle-même),
+        moitié du voisinage : chaque couple de cellules n'est vu qu'une fois.
+    """
+
+    return [offset for offset in product((-1, 0, 1), repeat=dimension) if offset >= (0,) * dimension]
+
+
+def neighbour_cell_pairs(cells, keys, encode):
+    """
+        Couples de cellules occupées voisines, par lots (cells_a, cells_b, same_cell).
+
+        Chaque couple n'est vu qu'une fois. En grande dimension, quand les
+        3^dimension décalages sont plus nombreux que les cellules occupées,
+        les cellules sont comparées entre elles par blocs (occupied_cell_pairs).
+    """
+
+    dimension = cells.shape[1]
+
+    if 3 ** dimension > len(keys):
+        all_cells = np.arange(len(keys))
+        yield all_cells, all_cells, True
+
+        for cells_a, cells_b in occupied_cell_pairs(cells, lambda shifts: (np.abs(shifts) <= 1).all(axis=-1)):
+            yield cells_a, cells_b, False
+        return
+
+    for offset in half_neighbourhood(dimension):
+        yield (*neighbour_cells(cells, keys, encode, offset), not any(offset))
+
+
+def occupied_cell_pairs(cells, close):
+    """
+        Couples (a, b), a < b, de cellules occupées dont le décalage
+        cells[b] - cells[a] vérifie close, par lots.
+
+        Toutes les cellules sont comparées par blocs de lignes : le coût
+        dépend du nombre de cellules occupées et non de la dimension.
+    """
+
+    rows = max(1, BATCH_SIZE // (len(cells) * cells.shape[1] or 1))
+
+    for start in range(0, len(cells), rows):
+        block = np.arange(start, min(start + rows, len(cells)))
+        shifts = cells[None, start:] - cells[block, None]
+
+        firsts, seconds = np.nonzero(close(shifts))
+        firsts, seconds = block[firsts], seconds + start
+        kept = firsts < seconds
+
+        yield firsts[kept], seconds[kept]
+
+
+def cell_encoder(cells):
+    """
+        Fonction associant à des cellules (m, dimension) des clefs triables,
+        égales pour des cellules égales :
+        - entiers (écriture en base mixte) si la grille, marge comprise, tient sur 62 bits
+        - octets bruts des coordonnées sinon
+    """
+
+    origin = cells.min(axis=0) - 1
+    spans = [int(span) for span in cells.max(axis=0) - origin + 2]
+
+    if np.prod(spans, dtype=object) < 1 << 62:
+        strides = np.array([int(np.prod(spans[axis + 1:], dtype=object)) for axis in range(len(spans))])
+        return lambda some_cells: (some_cells - origin) @ strides
+
+    row_type = np.dtype((np.void, cells.itemsize * cells.shape[1]))
+    return lambda some_cells: np.ascontiguousarray(some_cells).view(row_type).ravel()
+
+
+def hash_cells(distance, points):
+    """
+        Range les points par cellule de côté distance.
+
+        Retourne :
+        - order : permutation triant les points par cellule
+        - cells : cellules occupées (dans l'ordre des clefs)
+        - keys : clefs triées des cellules occupées
+        - starts, counts : début (dans l'ordre trié) et effectif de chaque cellule
+        - encode : fonction calculant les clefs de cellules
+    """
+
+    points_cells = np.floor_divide(points, distance).astype(np.int64)
+    encode = cell_encoder(points_cells)
+
+    points_keys = encode(points_cells)
+    order = np.argsort(points_keys, kind="stable")
+
+    keys, starts, counts = np.unique(points_keys[order], return_index=True, return_counts=True)
+
+    return order, points_cells[order[starts]], keys, starts, counts, encode
+
+
+def neighbour_cells(cells, keys, encode, offset):
+    """
+    indices of occupied cells paired with their occupied neighbour at given offset.
+    """
+    neighbour_keys = encode(cells + np.array(offset, dtype=np.int64))
+    positions = np.minimum(np.searchsorted(keys, neighbour_keys), len(keys) - 1)
+    found = keys[positions] == neighbour_keys
+
+    return np.flatnonzero(found), positions[found]
+
+
+def expand_pairs(starts_a, counts_a, starts_b, counts_b):
+    """
+    all couples (point of cell a, point of cell b) for each given couple of cells.
+    """
+    pairs_counts = counts_a * counts_b
+    cell_pairs = np.repeat(np.arange(len(pairs_counts)), pairs_counts)
+
+    local = np.arange(len(cell_pairs)) - np.repeat(np.cumsum(pairs_counts) - pairs_counts, pairs_counts)
+    counts_b = counts_b[cell_pairs]
+
+    return starts_a[cell_pairs] + local // counts_b, starts_b[cell_pairs] + local % counts_b
+
+
+def iter_batches(pairs_counts):
+    """
+    slices of consecutive cell couples holding about BATCH_SIZE point couples each.
+    """
+    bounds = np.searchsorted(np.cumsum(pairs_counts), np.arange(BATCH_SIZE, pairs_counts.sum(), BATCH_SIZE))
+    bounds = np.unique(np.concatenate(([0], bounds + 1, [len(pairs_counts)])))
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield slice(start, end)
+
+
+def iter_close_pairs(distance, points, hashed=None):
+    """
+        Itérateur sur les couples de points à distance inférieure ou égale
+        à distance, par lots de deux tableaux d'indices (dans l'ordre des
+        points donnés).
+
+        hashed : résultat de hash_cells(distance, points) s'il est déjà calculé
+    """
+
+    order, cells, keys, starts, counts, encode = hashed or hash_cells(distance, points)
+    sorted_points = points[order]
+    square_distance = distance * distance
+
+    for cells_a, cells_b, same_cell in neighbour_cell_pairs(cells, keys, encode):
+        # Inutile de comparer deux points seuls dans la même cellule
+        if same_cell:
+            cells_a = cells_b = cells_a[counts[cells_a] > 1]
+
+        for batch in iter_batches(counts[cells_a] * counts[cells_b]):
+            a, b = cells_a[batch], cells_b[batch]
+            near_a, near_b = expand_pairs(starts[a], counts[a], starts[b], counts[b])
+
+            if same_cell:
+                kept = near_a < near_b
+                near_a, near_b = near_a[kept], near_b[kept]
+
+            accepted = squared_distances(sorted_points, near_a, near_b) <= square_distance
+
+            yield order[near_a[accepted]], order[near_b[accepted]]
+
+
+# x---------------x
+# |  Dense cells  |
+# x---------------x
+
+def collapsed_cluster(distance, points, aggregate=False):
+    """
+        Union-find de tous les points, par regroupement en petites cellules.
+
+        Deux points d'une cellule de côté distance / sqrt(dimension) sont
+        toujours à bonne distance : chaque cellule occupée devient un seul
+        noeud. Seuls les couples de cellules assez proches sont comparés, et
+        la comparaison de deux cellules s'arrête au premier couple de points
+        à bonne distance. Le coût dépend du nombre de cellules occupées et
+        non du nombre de points par cellule.
+    """
+
+    dimension = points.shape[1]
+    side = distance / np.sqrt(dimension) * SMALL_CELL_MARGIN
+
+    order, cells, keys, starts, counts, encode = hash_cells(side, points)
+    sorted_points = points[order]
+
+    # Boîtes englobant les points de chaque cellule
+    lows = np.minimum.reduceat(sorted_points, starts, axis=0)
+    highs = np.maximum.reduceat(sorted_points, starts, axis=0)
+
+    cell_components = DisjointSet(len(keys))
+    square_distance = distance * distance
+
+    firsts, seconds = [], []
+    for cells_a, cells_b in small_cell_pairs(cells, keys, encode, distance, side):
+        # Boîtes trop éloignées : aucun couple possible
+        gaps = np.maximum(0, np.maximum(lows[cells_b] - highs[cells_a], lows[cells_a] - highs[cells_b]))
+        kept = squared_norms(gaps) <= square_distance
+        cells_a, cells_b = cells_a[kept], cells_b[kept]
+
+        # Boîtes assez proches : tous les couples sont à bonne distance
+        spans = np.maximum(highs[cells_b] - lows[cells_a], highs[cells_a] - lows[cells_b])
+        touching = squared_norms(spans) <= square_distance
+        cell_components.union_pairs(cells_a[touching], cells_b[touching])
+
+        firsts.append(cells_a[~touching])
+        seconds.append(cells_b[~touching])
+
+    cells_a, cells_b = np.concatenate(firsts), np.concatenate(seconds)
+
+    # Petits couples de cellules : tous les couples de points d'un coup
+    small = counts[cells_a] * counts[cells_b] <= LARGE_CELL_PAIR
+    small_a, small_b = cells_a[small], cells_b[small]
+
+    for batch in iter_batches(counts[small_a] * counts[small_b]):
+        a, b = small_a[batch], small_b[batch]
+
+        pending = cell_components.find_all(a) != cell_components.find_all(b)
+        a, b = a[pending], b[pending]
+
+        near_a, near_b = expand_pairs(starts[a], counts[a], starts[b], counts[b])
+        accepted = squared_distances(sorted_points, near_a, near_b) <= square_distance
+
+        pair_ids = np.repeat(np.arange(len(a)), counts[a] * counts[b])[accepted]
+        cell_components.union_pairs(a[pair_ids], b[pair_ids])
+
+    # Grands couples de cellules : un à un, arrêt au premier couple trouvé
+    for a, b in zip(cells_a[~small].tolist(), cells_b[~small].tolist()):
+        if cell_components.find(a) != cell_components.find(b):
+            if cells_touch(sorted_points[starts[a]:starts[a] + counts[a]],
+                           sorted_points[starts[b]:starts[b] + counts[b]], distance):
+                cell_components.union(a, b)
+
+    # Chaque point prend la composante de sa cellule
+    components = DisjointSet(len(points), points if aggregate else None)
+    cell_roots = cell_components.roots()
+    representatives = order[starts]
+    components.union_pairs(order, representatives[np.repeat(cell_roots, counts)])
+
+    return components
+
+
+def squared_norms(vectors):
+    """
+    squared norm of each row, squares summed in coordinates order.
+    """
+    total = np.zeros(len(vectors))
+
+    for axis in range(vectors.shape[1]):
+        total += vectors[:, axis] * vectors[:, axis]
+
+    return total
+
+
+def small_cell_pairs(cells, keys, encode, distance, side):
+    """
+        Couples de petites cellules occupées pouvant contenir deux points à
+        bonne distance, par lots (cells_a, cells_b), chaque couple une fois.
+
+        Les (2 * portée + 1)^dimension décalages ne sont parcourus que s'ils
+        sont moins nombreux que les cellules occupées, sinon les cellules
+        sont comparées entre elles par blocs (occupied_cell_pairs).
+    """
+
+    dimension = cells.shape[1]
+    reach = int(np.ceil(distance / side))
+
+    if (2 * reach + 1) ** dimension > len(keys):
+        def close(shifts):
+            gaps = np.maximum(np.abs(shifts) - 1, 0)
+            return (gaps * gaps).sum(axis=-1) * side * side <= distance * distance
+
+        yield from occupied_cell_pairs(cells, close)
+        return
+
+    for offset in small_cells_offsets(dimension, distance, side):
+        yield neighbour_cells(cells, keys, encode, offset)
+
+
+def small_cells_offsets(dimension, distance, side):
+    """
+        Décalages (moitié du voisinage, sans la cellule elle-même) vers les
+        petites cellules pouvant contenir un point à bonne distance.
+    """
+
+    reach = int(np.ceil(distance / side))
+    offsets = []
+
+    for offset in product(range(-reach, reach + 1), repeat=dimension):
+        gap = sum(max(abs(shift) - 1, 0) ** 2 for shift in offset) * side * side
+        if offset > (0,) * dimension and gap <= distance * distance:
+            offsets.append(offset)
+
+    return offsets
+
+
+def cells_touch(points_a, points_b, distance):
+    """
+        Existe-t-il un point de points_a à bonne distance d'un point de points_b ?
+
+        Les points hors de portée de la boîte de l'autre cellule sont écartés,
+        les points restants sont comparés par blocs en commençant par les plus
+        proches de l'autre cellule, jusqu'au premier couple trouvé.
+    """
+
+    points_a = points_a[squared_norms(box_gaps(points_a, points_b)) <= distance * distance]
+    if not len(points_a):
+        return False
+
+    points_b = points_b[squared_norms(box_gaps(points_b, points_a)) <= distance * distance]
+    if not len(points_b):
+        return False
+
+    points_a = points_a[np.argsort(squared_norms(points_a - points_b.mean(axis=0)))]
+    points_b = points_b[np.argsort(squared_norms(points_b - points_a.mean(axis=0)))]
+
+    rows = max(1, BATCH_SIZE // len(points_b))
+    all_b = np.arange(len(points_b))
+
+    for start in range(0, len(points_a), rows):
+        block = np.arange(start, min(start + rows, len(points_a)))
+        near_a, near_b = np.repeat(block, len(points_b)), np.tile(all_b, len(block))
+
+        square = np.zeros(len(near_a))
+        for axis in range(points_a.shape[1]):
+            diff = points_b[near_b, axis] - points_a[near_a, axis]
+            square += diff * diff
+
+        if (square <= distance * distance).any():
+            return True
+
+    return False
+
+
+def box_gaps(points, others):
+    """
+    per axis gap between each point and the bounding box of others.
+    """
+    return np.maximum(0, np.maximum(others.min(axis=0) - points, points - others.max(axis=0)))
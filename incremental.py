@@ -0,0 +1,131 @@
+"""
+incremental clustering : points are added by batches and components are kept
+up to date between batches.
+
+the spatial index (cells of side distance) and the union-find are kept between
+calls, so each batch only compares new points with the points of the cells
+around them.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+import grid
+from unionfind import DisjointSet
+
+NEIGHBOUR_OFFSETS = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+class IncrementalClusterer:
+    """
+        Clustering maintenu au fil des ajouts de points (en dimension 2).
+
+        Exemple :
+
+            clusterer = IncrementalClusterer(distance)
+            clusterer.add_points(batch)
+            sizes = clusterer.component_sizes()
+            clusterer.add_points(other_batch)
+            sizes = clusterer.component_sizes()
+    """
+
+    def __init__(self, distance, capacity=1024):
+        self.distance = distance
+
+        # Coordonnées des points ajoutés (capacité doublée au besoin)
+        self.points = np.empty((capacity, 2), dtype=np.float64)
+        self.count = 0
+
+        # Index spatial : cellule -> indices des points
+        self.cells = defaultdict(list)
+
+        self.components = DisjointSet(0)
+
+    def __len__(self):
+        return self.count
+
+    def add_points(self, batch):
+        """
+            Ajoute un lot de points et met à jour les composantes.
+
+            Seuls les points des cellules voisines des nouveaux points
+            sont comparés aux nouveaux points.
+
+            ValueError si les points ne sont pas en dimension 2.
+        """
+
+        batch = np.asarray(batch, dtype=np.float64)
+        if not batch.size:
+            return
+        if batch.ndim != 2 or batch.shape[1] != 2:
+            raise ValueError(f"points must be in dimension 2, got a batch of shape {batch.shape}")
+
+        first = self.count
+        self._store(batch)
+        self.components.add(len(batch))
+
+        # Couples nouveau point / nouveau point
+        for firsts, seconds in grid.iter_close_pairs(self.distance, batch):
+            self.components.union_pairs(firsts + first, seconds + first)
+
+        # Couples nouveau point / ancien point
+        batch_cells = np.floor_divide(batch, self.distance).astype(np.int64)
+        order = np.lexsort(batch_cells.T[::-1])
+        cells, starts, counts = np.unique(batch_cells[order], axis=0, return_index=True, return_counts=True)
+
+        if first:
+            old_members, old_starts, old_counts = self._neighbours(cells)
+
+            for part in grid.iter_batches(counts * old_counts):
+                news, olds = grid.expand_pairs(starts[part], counts[part], old_starts[part], old_counts[part])
+                news, olds = order[news] + first, old_members[olds]
+
+                dx = self.points[olds, 0] - self.points[news, 0]
+                dy = self.points[olds, 1] - self.points[news, 1]
+                accepted = dx*dx + dy*dy <= self.distance * self.distance
+
+                self.components.union_pairs(news[accepted], olds[accepted])
+
+        # Mise à jour de l'index
+        for (cell_x, cell_y), start, count in zip(cells.tolist(), starts.tolist(), counts.tolist()):
+            self.cells[(cell_x, cell_y)].extend((order[start:start + count] + first).tolist())
+
+    def _store(self, batch):
+        """ Copie les coordonnées du lot à la suite des points. """
+
+        needed = self.count + len(batch)
+        if needed > len(self.points):
+            points = np.empty((max(needed, 2 * len(self.points)), 2), dtype=np.float64)
+            points[:self.count] = self.points[:self.count]
+            self.points = points
+
+        self.points[self.count:needed] = batch
+        self.count = needed
+
+    def _neighbours(self, cells):
+        """
+            Anciens points des cellules voisines de chaque cellule donnée.
+
+            Retourne les indices de ces points, concaténés cellule par cellule,
+            ainsi que le début et le nombre d'indices de chaque cellule.
+        """
+
+        members, counts = [], []
+
+        for cell_x, cell_y in cells.tolist():
+            before = len(members)
+
+            for dx, dy in NEIGHBOUR_OFFSETS:
+                members.extend(self.cells.get((cell_x + dx, cell_y + dy), ()))
+
+            counts.append(len(members) - before)
+
+        counts = np.array(counts, dtype=np.int64)
+
+        return np.array(members, dtype=np.int64), np.cumsum(counts) - counts, counts
+
+    def component_sizes(self):
+        """ Tailles triées (décroissantes) des composantes de tous les points ajoutés. """
+
+        return self.components.component_sizes()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+instance files loading.
+
+two formats are supported:
+
+- text (.pts): a distance on the first line followed by one point per line,
+  coordinates separated by commas.
+- binary: a fixed size header (magic, dtype, distance, number of points,
+  dimension) followed by raw coordinates, memory-mapped when loaded.
+
+the filename "-" stands for a text instance read from stdin, parsed by a
+background thread while the previous blocks are processed.
+
+convert a text instance to binary:
+
+    ./instances.py instance.pts instance.ptsb
+"""
+
+import io
+import queue
+import struct
+import sys
+import threading
+from sys import argv
+from itertools import islice
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 16 # points per streamed block
+PREFETCH_BLOCKS = 4 # blocks parsed ahead by the background reader
+TEXT_PRECISION = 12 # decimals of written text coordinates
+INTEGER_PRECISION = 18 # beyond, 10 ** precision does not fit in 64 bits integers
+
+# ascii digits of every number below 10000, four characters packed in 32 bits
+DIGIT_GROUPS = np.frombuffer("".join(f"{group:04d}" for group in range(10000)).encode("ascii"),
+                             dtype=np.uint32)
+
+BINARY_MAGIC = b"PTSB"
+BINARY_HEADER = struct.Struct("<4s4sdQQ") # magic, dtype, distance, points, dimension
+
+
+def load_instance(filename):
+    """
+    loads instance file, text or binary (detected by its magic number),
+    or text instance from stdin if filename is "-".
+    returns distance limit and points as a (n, dimension) float array.
+    """
+    if filename == "-":
+        return load_stream(filename)
+
+    if is_binary(filename):
+        return load_binary(filename)
+
+    return load_text(filename)
+
+
+def read_distance(filename):
+    """
+    distance limit of instance file, without loading its points.
+    """
+    if is_binary(filename):
+        with open(filename, "rb") as instance_file:
+            return BINARY_HEADER.unpack(instance_file.read(BINARY_HEADER.size))[2]
+
+    with open(filename, "r", encoding="utf-8") as instance_file:
+        return float(instance_file.readline())
+
+
+def load_text(filename):
+    """
+    loads .pts file in one pass.
+    returns distance limit and points as a contiguous (n, dimension) float array.
+    """
+    with open(filename, "r", encoding="utf-8") as instance_file:
+        distance = float(instance_file.readline())
+        body = instance_file.read()
+
+    return distance, parse_points(body)
+
+
+def parse_points(body):
+    """
+    parses all coordinate lines of an instance at once.
+    the dimension is taken from the first non empty line.
+    """
+    first_line = body.lstrip().partition("\n")[0].strip()
+    dimension = first_line.count(",") + 1 if first_line else 2
+
+    coordinates = np.fromstring(body.replace(",", " "), dtype=np.float64, sep=" ")
+
+    if coordinates.size % dimension:
+        raise ValueError(f"{coordinates.size} coordinates is not a multiple of dimension {dimension}")
+
+    return coordinates.reshape(-1, dimension)
+
+
+# x-------------x
+# |  Streaming  |
+# x-------------x
+
+def open_chunks(source, chunk_size=CHUNK_SIZE):
+    """
+    opens instance for streaming, source is a filename or "-" for stdin.
+    returns distance limit and an iterator over blocks of at most chunk_size
+    points, (chunk_size, dimension) float arrays.
+    only one block at a time is held in memory.
+    """
+    if source == "-":
+        distance = float(sys.stdin.readline())
+        return distance, iter_text_chunks(sys.stdin, chunk_size)
+
+    if is_binary(source):
+        distance, points = load_binary(source)
+        return distance, (points[start:start + chunk_size] for start in range(0, len(points), chunk_size))
+
+    instance_file = open(source, "r", encoding="utf-8")
+    distance = float(instance_file.readline())
+
+    return distance, iter_text_chunks(instance_file, chunk_size, close=True)
+
+
+def prefetch(chunks, depth=PREFETCH_BLOCKS):
+    """
+    iterates on chunks produced ahead by a background thread.
+    at most depth blocks wait in a bounded queue : reading and parsing
+    overlap with the processing of previous blocks, in bounded memory.
+    errors of the reader are raised again in the caller's thread.
+    """
+    blocks = queue.Queue(maxsize=depth)
+    end = object()
+
+    def read():
+        try:
+            for chunk in chunks:
+                blocks.put(chunk)
+        except Exception as error: # pylint: disable=broad-except
+            blocks.put(error)
+        finally:
+            blocks.put(end)
+
+    threading.Thread(target=read, daemon=True).start()
+
+    while True:
+        block = blocks.get()
+
+        if block is end:
+            return
+        if isinstance(block, Exception):
+            raise block
+
+        yield block
+
+
+def gather(chunks):
+    """
+    copies blocks of points into one (n, dimension) array, grown by doubling.
+    """
+    points, count = None, 0
+
+    for chunk in chunks:
+        if points is None:
+            points = np.empty((max(len(chunk), CHUNK_SIZE), chunk.shape[1]), dtype=np.float64)
+
+        if count + len(chunk) > len(points):
+            grown = np.empty((max(count + len(chunk), 2 * len(points)), points.shape[1]), dtype=np.float64)
+            grown[:count] = points[:count]
+            points = grown
+
+        points[count:count + len(chunk)] = chunk
+        count += len(chunk)
+
+    if points is None:
+        return np.empty((0, 2), dtype=np.float64)
+
+    return points[:count]
+
+
+def load_stream(source="-", chunk_size=CHUNK_SIZE):
+    """
+    loads instance by blocks, parsed by a background reader (see prefetch).
+    returns distance limit and points as a (n, dimension) float array.
+    """
+    distance, chunks = open_chunks(source, chunk_size)
+
+    return distance, gather(prefetch(chunks))
+
+
+def iter_text_chunks(instance_file, chunk_size=CHUNK_SIZE, close=False):
+    """
+    iterates on blocks of chunk_size coordinate lines, parsed in one pass each.
+    """
+    try:
+        while True:
+            body = "".join(islice(instance_file, chunk_size))
+            if not body:
+                return
+
+            points = parse_points(body)
+            if len(points):
+                yield points
+    finally:
+        if close:
+            instance_file.close()
+
+
+# x-----------x
+# |  Writing  |
+# x-----------x
+
+def format_text(points, precision=TEXT_PRECISION):
+    """
+    text lines of a block of points, coordinates with precision decimals.
+    built as a byte matrix with array operations (no formatting per number) :
+    every line has the same width, numbers are padded with spaces.
+    coordinates whose scaled values do not fit in 64 bits integers (or not
+    finite) are formatted number by number instead.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    count, dimension = points.shape
+
+    if points.size and not (precision <= INTEGER_PRECISION and np.isfinite(points).all()
+                            and np.abs(points).max() * 10.0 ** precision < 2.0 ** 63):
+        return format_numbers(points, precision)
+
+    scale = 10 ** precision
+    values = np.rint(np.abs(points) * scale).astype(np.int64)
+    integers, decimals = values // scale, values % scale
+
+    digits = len(str(int(integers.max()))) if values.size else 1
+    number_width = 1 + digits + (1 + precision if precision else 0) # sign, digits, point, decimals
+    line = np.full((count, dimension * (number_width + 2)), ord(" "), dtype=np.uint8)
+
+    for axis in range(dimension):
+        column = axis * (number_width + 2)
+
+        # Partie entière, zéros de tête remplacés par des espaces, signe juste avant
+        characters = digit_characters(integers[:, axis], digits)
+        leading = np.logical_and.accumulate(characters[:, :-1] == ord("0"), axis=1)
+        characters[:, :-1][leading] = ord(" ")
+        line[:, column + 1:column + 1 + digits] = characters
+
+        negatives = np.flatnonzero((points[:, axis] < 0) & (values[:, axis] > 0))
+        line[negatives, column + leading[negatives].sum(axis=1)] = ord("-")
+
+        if precision:
+            line[:, column + 1 + digits] = ord(".")
+            line[:, column + 2 + digits:column + number_width] = digit_characters(decimals[:, axis], precision)
+
+        line[:, column + number_width] = ord(",") if axis < dimension - 1 else ord("\n")
+
+    return line[:, :-1].tobytes()
+
+
+def format_numbers(points, precision=TEXT_PRECISION):
+    """
+    text lines of a block of points, formatted number by number (slow).
+    """
+    text = io.BytesIO()
+    np.savetxt(text, points, fmt=f"%.{precision}f", delimiter=", ")
+
+    return text.getvalue()
+
+
+def digit_characters(values, width):
+    """
+    (n, width) ascii digits of non negative integers, padded with zeros.
+    digits are written by groups of four, read from a table.
+    """
+    groups = -(-width // 4)
+    characters = np.empty((len(values), groups), dtype=np.uint32)
+    remaining = values.copy()
+
+    for group in range(groups - 1, -1, -1):
+        characters[:, group] = DIGIT_GROUPS[remaining % 10000]
+        remaining //= 10000
+
+    return characters.view(np.uint8)[:, 4 * groups - width:]
+
+
+def write_text(instance_file, distance, chunks, precision=TEXT_PRECISION):
+    """
+    writes text instance (binary file object) from blocks of points.
+    """
+    instance_file.write(f"{distance}\n".encode("ascii"))
+
+    for chunk in chunks:
+        instance_file.write(format_text(chunk, precision))
+
+
+# x----------x
+# |  Binary  |
+# x----------x
+
+def is_binary(filename):
+    """
+    does the file start with the binary instance magic number ?
+    """
+    with open(filename, "rb") as instance_file:
+        return instance_file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def load_binary(filename):
+    """
+    memory-maps binary instance file.
+    returns distance limit and a read only (n, dimension) array of points.
+    """
+    with open(filename, "rb") as instance_file:
+        header = instance_file.read(BINARY_HEADER.size)
+
+    magic, dtype, distance, count, dimension = BINARY_HEADER.unpack(header)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{filename} is not a binary instance")
+
+    dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+    if count == 0:
+        return distance, np.empty((0, dimension), dtype=dtype)
+
+    points = np.memmap(filename, dtype=dtype, mode="r",
+                       offset=BINARY_HEADER.size, shape=(count, dimension))
+
+    return distance, points
+
+
+def save_binary(filename, distance, points, dtype=np.float64):
+    """
+    writes points in binary instance format.
+    """
+    points = np.ascontiguousarray(points, dtype=dtype)
+    if points.ndim != 2: # empty instance
+        points = points.reshape(-1, 2)
+
+    with open(filename, "wb") as instance_file:
+        write_binary_header(instance_file, distance, len(points), points.shape[1], points.dtype)
+        points.tofile(instance_file)
+
+
+def write_binary_header(instance_file, distance, count, dimension, dtype=np.float64):
+    """
+    writes binary instance header, raw coordinates must follow.
+    """
+    instance_file.write(BINARY_HEADER.pack(
+        BINARY_MAGIC, np.dtype(dtype).str.encode("ascii"), distance, count, dimension
+    ))
+
+
+def convert(source, destination, dtype=np.float64):
+    """
+    converts a text instance into a binary one.
+    """
+    distance, points = load_text(source)
+    save_binary(destination, distance, points, dtype)
+
+
+def main():
+    """
+    usage: ./instances.py instance.pts instance.ptsb [float32|float64]
+    """
+    if len(argv) not in (3, 4):
+        print(main.__doc__.strip())
+        return
+
+    convert(argv[1], argv[2], argv[3] if len(argv) == 4 else np.float64)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@
 
 from time import perf_counter
 
+import numpy as np
+
 from geo.tycat   import tycat
 from geo.point   import Point
 from geo.segment import Segment
@@ -73,16 +75,15 @@ def test_rapport(points, buckets, BUCKET_SIZE, groups, segments):
     for b in buckets.keys():
         segments['buckets'].append(((0, int(b) * BUCKET_SIZE), (1, int(b) * BUCKET_SIZE)))
 
-    # Display
-    if len(points) <= 1000:
-        graph_segment = []
+    # Display (au delà de POINT_BUDGET points, tycat dessine une carte de densité)
+    graph_segment = []
 
-        for linked_segment in segments.values():
-            graph_segment.append([Segment([Point(list(p1)), Point(list(p2))]) for p1, p2 in linked_segment])
+    for linked_segment in segments.values():
+        graph_segment.append([Segment([Point(list(p1)), Point(list(p2))]) for p1, p2 in linked_segment])
 
-        tycat([Point(point) for point in points], *graph_segment)
+    tycat(np.asarray(points, dtype=np.float64).reshape(-1, 2), *graph_segment)
 
-        print('')
+    print('')
 
     # -- Performances --
 
@@ -0,0 +1,78 @@
+"""
+multi-process clustering by horizontal bands.
+
+the plane is split into bands made of consecutive cuts (y // distance). each
+band also takes the first cut of the next band : any close pair crossing a
+border has one point in each of the two cuts touching it, so it lies within
+one band. each band is clustered by a worker process, and the points shared
+by two bands join their components.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import grid
+from unionfind import DisjointSet
+
+
+def components_sizes(distance, points, jobs):
+    """
+        Tailles triées (décroissantes) des composantes connexes,
+        calculées par jobs processus.
+
+        Post-conditions :
+        - même résultat que le calcul sur un seul processus
+    """
+
+    return cluster(distance, points, jobs).component_sizes()
+
+
+def split_bands(cut_keys, jobs):
+    """
+        Premier cut de chaque bande (sauf la première), choisis pour que
+        les bandes contiennent à peu près le même nombre de points.
+    """
+
+    sorted_keys = np.sort(cut_keys)
+    borders = sorted_keys[(np.arange(1, jobs) * len(sorted_keys)) // jobs]
+
+    return np.unique(borders[borders > sorted_keys[0]])
+
+
+def cluster(distance, points, jobs, aggregate=False):
+    """
+        Union-find de tous les points.
+
+        Paramètres:
+        - distance : réel positif représentant une distance
+        - points : tableau (n, dimension) ou séquence de tuples de coordonnées
+        - jobs : nombre de processus
+        - aggregate : les unions tiennent à jour les agrégats des composantes
+    """
+
+    points = grid.as_points(points)
+    components = DisjointSet(len(points), points if aggregate else None)
+
+    if not len(points):
+        return components
+
+    cut_keys = np.floor_divide(points[:, -1], distance).astype(np.int64)
+    borders = split_bands(cut_keys, jobs)
+
+    # Points de chaque bande, premier cut de la bande suivante compris
+    order = np.argsort(cut_keys, kind="stable")
+    sorted_keys = cut_keys[order]
+    starts = np.searchsorted(sorted_keys, borders)
+    ends = np.searchsorted(sorted_keys, borders, side="right")
+    bands = [order[start:end] for start, end in zip(np.r_[0, starts], np.r_[ends, len(points)])]
+
+    # Composantes de chaque bande, raccordées par les points partagés
+    with ProcessPoolExecutor(max_workers=min(jobs, len(bands))) as pool:
+        bands_labels = pool.map(partial(grid.components_labels, distance), (points[band] for band in bands))
+
+        for band, labels in zip(bands, bands_labels):
+            components.union_pairs(band, band[labels])
+
+    return components
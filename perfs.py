@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 
-import os
-import sys
 from itertools import product
 from random import uniform
 from collections import defaultdict
@@ -33,45 +31,42 @@ def main():
     for dist_key, _ in product(range(len(DISTANCES)), range(NB_POINTS // STEP)):
         sums[dist_key].append(0.0)
 
-    with open(os.devnull, 'w') as out_null:
-        for prog_call in range (1, CALL_PRECISION + 1):
-            points_lists = []
+    for prog_call in range (1, CALL_PRECISION + 1):
+        # Tri conservé d'une étape à l'autre
+        points_lists = connectes.SortedPoints([])
 
-            # For each steps
-            for step_id in range(NB_POINTS // STEP):
+        # For each steps
+        for step_id in range(NB_POINTS // STEP):
 
-                # Add points
-                points_lists.extend((uniform(0,1), uniform(0,1)) for _ in range(STEP))
+            # Add points
+            points_lists.extend([(uniform(0,1), uniform(0,1)) for _ in range(STEP)])
 
-                # For each negative pow
-                for dist_key, distance in enumerate(DISTANCES):
-                    current_try += 1
-                    libtests.printProgressBar(current_try, total_try)
+            # For each negative pow
+            for dist_key, distance in enumerate(DISTANCES):
+                current_try += 1
+                libtests.printProgressBar(current_try, total_try)
 
-                    # -- Run average --
-                    sys.stdout = out_null
+                # -- Run average --
+                Perf.reset()
 
-                    Perf.reset()
+                with Perf("perf"):
+                    connectes.components_sizes(distance, points_lists)
                 
-                    with Perf("perf"):
-                        connectes.main_perfs(distance, points_lists)
-                    
-                    sums[dist_key][step_id] += Perf.times["perf"][0]
-                    sys.stdout = sys.__stdout__
+                sums[dist_key][step_id] += Perf.times["perf"][0]
 
-            averages.clear()
-            for dist_key, step_id in product(range(len(DISTANCES)), range(NB_POINTS // STEP)):
-                averages[dist_key].append(sums[dist_key][step_id] / float(prog_call))
+        averages.clear()
+        for dist_key, step_id in product(range(len(DISTANCES)), range(NB_POINTS // STEP)):
+            averages[dist_key].append(sums[dist_key][step_id] / float(prog_call))
 
-            plt.clf()
+        plt.clf()
 
-            for dist_key, result in averages.items():
-                plt.plot([(step + 1) * STEP for step in range(len(result))], result, ['r','b','g','m','y'][dist_key])
+        for dist_key, result in averages.items():
+            plt.plot([(step + 1) * STEP for step in range(len(result))], result, ['r','b','g','m','y'][dist_key])
 
-            plt.legend(DISTANCES)
+        plt.legend(DISTANCES)
 
-            # plt.show()
-            plt.pause(0.1)
+        # plt.show()
+        plt.pause(0.1)
 
     print("\n  Au revoir !\n")
 
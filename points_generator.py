@@ -1,9 +1,73 @@
 #!/usr/bin/env python3
+"""
+usage: ./points_generator.py distance count [binary_file]
+
+without binary_file, prints a text instance on stdout (or writes --output).
+points are drawn by blocks from a seed (same seed, same instance) following
+one of the distributions of workloads.py :
+
+    ./points_generator.py 0.001 10000000 --distribution blobs --seed 3 -o blobs.pts
+    ./points_generator.py 0.001 10000000 blobs.ptsb --distribution blobs --seed 3
+"""
 
-from random import uniform
 import sys
+from argparse import ArgumentParser
+from time import perf_counter
+
+import numpy as np
+
+import workloads
+from instances import TEXT_PRECISION, write_binary_header, write_text
+
+
+def write_instance(output, distance, count, distribution="uniform", seed=0, binary=False,
+                   precision=TEXT_PRECISION, dtype=np.float64):
+    """
+    writes generated instance in binary file object output.
+    returns number of bytes written.
+    """
+    blocks = workloads.iter_generate(distribution, count, seed)
+    start = output.tell() if output.seekable() else 0
+    written = 0
+
+    if binary:
+        write_binary_header(output, distance, count, 2, dtype)
+        for block in blocks:
+            output.write(np.ascontiguousarray(block, dtype=dtype))
+    else:
+        write_text(output, distance, blocks, precision)
+
+    if output.seekable():
+        written = output.tell() - start
+
+    return written
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("distance", type=float)
+    parser.add_argument("count", type=int)
+    parser.add_argument("binary_file", nargs="?", help="write a binary instance in this file")
+    parser.add_argument("--distribution", choices=workloads.WORKLOADS, default="uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="text instance file (default: stdout)")
+    parser.add_argument("--precision", type=int, default=TEXT_PRECISION, help="decimals of text coordinates")
+    parser.add_argument("--dtype", choices=["float32", "float64"], default="float64",
+                        help="coordinates type of binary instances")
+    arguments = parser.parse_args()
+
+    start = perf_counter()
+    destination = arguments.binary_file or arguments.output
+
+    with (open(destination, "wb") if destination else sys.stdout.buffer) as output:
+        written = write_instance(output, arguments.distance, arguments.count, arguments.distribution,
+                                 arguments.seed, bool(arguments.binary_file), arguments.precision,
+                                 arguments.dtype)
+
+    if destination:
+        elapsed = perf_counter() - start
+        print(f"{written / 1e6:.1f} MB in {elapsed:.2f}s ({written / 1e6 / elapsed:.0f} MB/s)", file=sys.stderr)
 
-print(sys.argv[1])
 
-for _ in range(int(sys.argv[2])):
-    print(f"{uniform(0,1)}, {uniform(0,1)}")
+if __name__ == '__main__':
+    main()
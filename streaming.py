@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+bounded memory clustering of instances streamed in abscissa order.
+
+usage: ./streaming.py [--sort] instance.pts   (or "-" to read from stdin)
+
+points are read by blocks and swept by increasing abscissa. only the points
+within distance (in x) of the current point are kept : once a point leaves
+this window nothing can be connected to it anymore. components without any
+point left in the window are finished and only their size is kept.
+
+the window is hashed into small cells of side distance / sqrt(2) : the points
+of a small cell are all connected, so a new point is only compared with the
+distinct positions of neighbour cells of another component, until the first
+close one.
+
+unsorted instances larger than memory are first sorted externally (--sort) :
+blocks of RUN_SIZE points are sorted and saved as runs on disk, then the runs
+are merged block by block while being swept.
+"""
+
+import os
+import tempfile
+from argparse import ArgumentParser
+from collections import Counter, deque
+from itertools import product
+
+import numpy as np
+
+from instances import CHUNK_SIZE, open_chunks, prefetch
+
+RUN_SIZE = 1 << 22 # points sorted in memory at a time by the external sort
+
+# Marge garantissant que deux points d'une même petite cellule sont à bonne distance
+SMALL_CELL_MARGIN = 1 - 1e-9
+
+
+class WindowClusterer:
+    """
+        Clustering par balayage des points triés par abscisse.
+
+        La mémoire utilisée est proportionnelle au nombre de points
+        dans la fenêtre [x - distance, x] et non au nombre total de points.
+
+        Exemple :
+
+            clusterer = WindowClusterer(distance)
+            for chunk in chunks:
+                clusterer.add_points(chunk)
+            sizes = clusterer.component_sizes()
+    """
+
+    def __init__(self, distance):
+        self.distance = distance
+
+        # Fenêtre : (x, y, clef de cellule) par ordre d'arrivée, et petites
+        # cellules de côté distance / sqrt(2). Les points d'une petite cellule
+        # sont tous dans la même composante : chaque cellule garde un label et
+        # le nombre de points de la fenêtre à chaque position (x, y) distincte.
+        self.side = distance / np.sqrt(2) * SMALL_CELL_MARGIN
+        self.window = deque()
+        self.cells = {}
+
+        # Décalages vers les petites cellules voisines pouvant contenir un point
+        # à bonne distance, selon la moitié (en x, en y) de sa cellule où est le point
+        self.offsets = {halves: neighbour_offsets(distance, self.side, *halves)
+                        for halves in product((0, 1), repeat=2)}
+
+        # Composantes : union-find sur les labels des cellules
+        self.parent = {}
+        self.sizes = {}
+        self.live = {} # nombre de points de la composante encore dans la fenêtre
+
+        # Résumé des composantes terminées : taille -> nombre de composantes
+        self.finished = Counter()
+
+        self.points_count = 0
+        self.last_x = float('-inf')
+
+    def find(self, label):
+        """ Racine du label (avec compression par moitié). """
+
+        parent = self.parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+
+        return label
+
+    def add_points(self, points):
+        """
+            Ajoute un bloc de points à la fenêtre.
+
+            Pré-conditions :
+            - les points (tous blocs confondus) arrivent par abscisse croissante
+            - les points sont en dimension 2 (ValueError sinon)
+        """
+
+        shape = np.shape(points)
+        if len(points) and (len(shape) != 2 or shape[1] != 2):
+            raise ValueError(f"streamed points must be in dimension 2, got shape {shape}")
+
+        distance, half_side = self.distance, self.side / 2
+        square_distance = distance * distance
+        window, cells = self.window, self.cells
+        parent, sizes, live = self.parent, self.sizes, self.live
+
+        for point in points.tolist() if hasattr(points, "tolist") else points:
+            x, y = point[0], point[1]
+
+            if x < self.last_x:
+                raise ValueError("streamed points must be sorted by abscissa")
+            self.last_x = x
+
+            # Sortie des points trop à gauche (écart calculé comme dans le test de distance)
+            while window and (x - window[0][0]) * (x - window[0][0]) > square_distance:
+                self._evict(*window.popleft())
+
+            # Petite cellule déjà occupée : même composante que ses points,
+            # sinon nouvelle composante
+            half_x, half_y = int(x // half_side), int(y // half_side)
+            cell_x, cell_y = half_x >> 1, half_y >> 1
+            cell_key = (cell_x, cell_y)
+            cell = cells.get(cell_key)
+
+            if cell:
+                cell[0] = root = self.find(cell[0])
+                sizes[root] += 1
+                live[root] += 1
+            else:
+                parent[self.points_count] = root = self.points_count
+                sizes[root], live[root] = 1, 1
+                cell = cells[cell_key] = [root, {}]
+
+            self.points_count += 1
+
+            # Fusion avec les composantes des cellules voisines, à la première
+            # position à bonne distance (chaque position distincte vue une fois)
+            for shift_x, shift_y in self.offsets[half_x & 1, half_y & 1]:
+                near_cell = cells.get((cell_x + shift_x, cell_y + shift_y))
+                if not near_cell:
+                    continue
+
+                near_root = self.find(near_cell[0])
+                if near_root == root:
+                    continue
+
+                for other_x, other_y in near_cell[1]:
+                    dx, dy = x - other_x, y - other_y
+
+                    if dx*dx + dy*dy <= square_distance:
+                        if sizes[near_root] < sizes[root]:
+                            near_root, root = root, near_root
+
+                        parent[root] = near_root
+                        sizes[near_root] += sizes.pop(root)
+                        live[near_root] += live.pop(root)
+                        root = near_root
+                        break
+
+            positions = cell[1]
+            positions[(x, y)] = positions.get((x, y), 0) + 1
+            window.append((x, y, cell_key))
+
+            # Les labels qui ne sont plus des racines s'accumulent : compactage
+            if len(parent) > 2 * len(cells) + 64:
+                self._compact()
+                parent = self.parent
+
+    def _evict(self, x, y, cell_key):
+        """ Retire le plus ancien point de la fenêtre. """
+
+        cell = self.cells[cell_key]
+        positions = cell[1]
+
+        positions[(x, y)] -= 1
+        if not positions[(x, y)]:
+            del positions[(x, y)]
+            if not positions:
+                del self.cells[cell_key]
+
+        root = self.find(cell[0])
+        self.live[root] -= 1
+
+        if not self.live[root]:
+            del self.live[root]
+            self.finished[self.sizes.pop(root)] += 1
+
+    def _compact(self):
+        """ Ne garde dans l'union-find que les racines des cellules de la fenêtre. """
+
+        cells = self.cells.values()
+        for cell in cells:
+            cell[0] = self.find(cell[0])
+
+        self.parent = {cell[0]: cell[0] for cell in cells}
+
+    def component_sizes(self):
+        """
+            Tailles triées des composantes de tous les points ajoutés,
+            terminées ou encore dans la fenêtre.
+        """
+
+        counts = Counter(self.finished)
+        for size in self.sizes.values():
+            counts[size] += 1
+
+        return sorted(counts.elements(), reverse=True)
+
+
+def neighbour_offsets(distance, side, upper_x, upper_y):
+    """
+    offsets of the small cells of given side that may hold a point at distance
+    of a point in the lower (0) or upper (1) half, in x and in y, of its cell.
+    """
+    def smallest_gap(shift, upper):
+        if shift > 0:
+            return shift - 0.5 - 0.5 * upper
+        if shift < 0:
+            return -shift - 1 + 0.5 * upper
+        return 0
+
+    offsets = [(shift_x, shift_y) for shift_x, shift_y in product(range(-2, 3), repeat=2)
+               if (shift_x, shift_y) != (0, 0)
+               and (smallest_gap(shift_x, upper_x) ** 2 + smallest_gap(shift_y, upper_y) ** 2) * side * side
+               <= distance * distance]
+
+    return sorted(offsets, key=lambda offset: offset[0] ** 2 + offset[1] ** 2)
+
+
+def stream_components_sizes(distance, chunks):
+    """
+    clusters blocks of points sorted by abscissa with bounded memory.
+    returns sorted sizes of all components.
+    """
+    clusterer = WindowClusterer(distance)
+
+    for chunk in chunks:
+        clusterer.add_points(chunk)
+
+    return clusterer.component_sizes()
+
+
+# x-----------------x
+# |  External sort  |
+# x-----------------x
+
+def write_sorted_runs(chunks, directory, run_size=RUN_SIZE):
+    """
+    sorts blocks of about run_size points by abscissa, each saved in directory.
+    returns filenames of the runs (.npy).
+    raises ValueError on the first block not in dimension 2 (the sweep only
+    reads abscissas and ordinates).
+    """
+    runs, pending, pending_count = [], [], 0
+
+    def save_run():
+        run = np.concatenate(pending)
+        filename = os.path.join(directory, f"run_{len(runs)}.npy")
+        np.save(filename, run[np.argsort(run[:, 0], kind="stable")])
+        runs.append(filename)
+
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if len(chunk) and (chunk.ndim != 2 or chunk.shape[1] != 2):
+            raise ValueError(f"out-of-core sweep only clusters points in dimension 2, got shape {chunk.shape}")
+
+        pending.append(chunk)
+        pending_count += len(chunk)
+
+        if pending_count >= run_size:
+            save_run()
+            pending, pending_count = [], 0
+
+    if pending_count:
+        save_run()
+
+    return runs
+
+
+def iter_merged(runs, block_size=CHUNK_SIZE):
+    """
+    iterates on blocks of the points of all runs, by increasing abscissa.
+
+    runs are memory-mapped and read by blocks of block_size points : at each
+    step, every point up to the smallest last abscissa of the current blocks
+    is taken, so at most one block per run is in memory.
+    """
+    arrays = [np.load(run, mmap_mode="r") for run in runs]
+    positions = [0] * len(arrays)
+
+    while True:
+        blocks = {run_id: array[positions[run_id]:positions[run_id] + block_size]
+                  for run_id, array in enumerate(arrays) if positions[run_id] < len(array)}
+        if not blocks:
+            return
+
+        threshold = min(block[-1, 0] for block in blocks.values())
+        parts = []
+
+        for run_id, block in blocks.items():
+            taken = int(np.searchsorted(block[:, 0], threshold, "right"))
+            parts.append(block[:taken])
+            positions[run_id] += taken
+
+        merged = np.concatenate(parts)
+        yield merged[np.argsort(merged[:, 0], kind="stable")]
+
+
+def external_components_sizes(distance, chunks, run_size=RUN_SIZE, directory=None):
+    """
+    clusters blocks of points in any order with bounded memory :
+    external sort into runs on disk (in directory, temporary by default),
+    then sweep of the merged runs.
+    returns sorted sizes of all components.
+    """
+    with tempfile.TemporaryDirectory(dir=directory) as runs_directory:
+        runs = write_sorted_runs(chunks, runs_directory, run_size)
+
+        return stream_components_sizes(distance, iter_merged(runs))
+
+
+def main():
+    """
+    clusters each given instance and prints sorted sizes.
+    """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("instances", nargs="+", help="instance files (- for stdin)")
+    parser.add_argument("--sort", action="store_true", help="instances are not sorted : sort them on disk first")
+    parser.add_argument("--run-size", type=int, default=RUN_SIZE, help="points per sorted run")
+    parser.add_argument("--temp-dir", help="directory of the sorted runs")
+    arguments = parser.parse_args()
+
+    for instance in arguments.instances:
+        distance, chunks = open_chunks(instance)
+
+        if arguments.sort:
+            print(external_components_sizes(distance, prefetch(chunks), arguments.run_size, arguments.temp_dir))
+        else:
+            print(stream_components_sizes(distance, prefetch(chunks)))
+
+
+if __name__ == '__main__':
+    main()
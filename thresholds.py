@@ -0,0 +1,120 @@
+"""
+clustering for many distances in one pass.
+
+all close pairs up to the largest distance are collected once and sorted by
+length, then merged in that order (kruskal) : the components for a distance
+are the ones obtained once every pair not longer than it has been merged.
+"""
+
+import numpy as np
+
+import grid
+from unionfind import DisjointSet
+
+# Nombre de couples examinés à la fois pour l'historique
+HISTORY_BATCH_SIZE = 1 << 14
+
+
+def close_pairs(max_distance, points):
+    """
+        Couples de points à distance inférieure ou égale à max_distance.
+
+        Retourne les carrés des longueurs et les deux tableaux d'indices.
+    """
+
+    squared_lengths, firsts, seconds = [], [], []
+
+    for near_a, near_b in grid.iter_close_pairs(max_distance, points):
+        squared_lengths.append(grid.squared_distances(points, near_a, near_b))
+        firsts.append(near_a)
+        seconds.append(near_b)
+
+    if not firsts:
+        return np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    return np.concatenate(squared_lengths), np.concatenate(firsts), np.concatenate(seconds)
+
+
+def sorted_pairs(max_distance, points):
+    """
+    close pairs (squared lengths, firsts, seconds) sorted by length.
+    """
+    squared_lengths, firsts, seconds = close_pairs(max_distance, points)
+    order = np.argsort(squared_lengths, kind="stable")
+
+    return squared_lengths[order], firsts[order], seconds[order]
+
+
+def components_sizes_by_distance(distances, points):
+    """
+        Tailles triées (décroissantes) des composantes pour chaque distance.
+
+        Paramètres:
+        - distances : liste de réels positifs
+        - points : tableau (n, dimension) ou séquence de tuples de coordonnées
+
+        Post-conditions :
+        - dictionnaire distance -> même résultat que grid.components_sizes
+    """
+
+    points = grid.as_points(points)
+    if not len(points):
+        return {distance: [] for distance in distances}
+
+    components = DisjointSet(len(points))
+    sizes = {}
+
+    squared_lengths, firsts, seconds = close_pairs(max(distances), points)
+
+    # Le tri complet est inutile : il suffit de ranger chaque couple dans la
+    # tranche de la plus petite distance qui l'accepte (tri par base sur la tranche)
+    distances = sorted(set(distances))
+    slices = np.searchsorted(np.square(distances), squared_lengths).astype(np.uint16)
+    order = np.argsort(slices, kind="stable")
+    bounds = np.searchsorted(slices[order], np.arange(len(distances) + 1))
+
+    for distance, start, end in zip(distances, bounds[:-1], bounds[1:]):
+        components.union_pairs(firsts[order[start:end]], seconds[order[start:end]])
+        sizes[distance] = components.component_sizes()
+
+    return sizes
+
+
+def merge_history(max_distance, points):
+    """
+        Historique des fusions du clustering par lien simple,
+        jusqu'à max_distance.
+
+        Retourne des colonnes, une ligne par fusion dans l'ordre des longueurs :
+        - lengths : longueur du couple provoquant la fusion
+        - firsts, seconds : les deux points de ce couple
+        - sizes : effectif de la composante obtenue
+    """
+
+    points = grid.as_points(points)
+    components = DisjointSet(len(points))
+    history = []
+
+    squared_lengths, firsts, seconds = sorted_pairs(max_distance, points) if len(points) else ([], [], [])
+
+    for start in range(0, len(firsts), HISTORY_BATCH_SIZE):
+        batch = slice(start, start + HISTORY_BATCH_SIZE)
+
+        # Seuls les couples reliant deux composantes avant le lot sont examinés un à un
+        candidates = start + np.flatnonzero(
+            components.find_all(firsts[batch]) != components.find_all(seconds[batch])
+        )
+
+        for pair_id, first, second in zip(candidates.tolist(), firsts[candidates].tolist(),
+                                          seconds[candidates].tolist()):
+            if components.find(first) != components.find(second):
+                root = components.union(first, second)
+                history.append((pair_id, first, second, int(components.size[root])))
+
+    if not history:
+        empty = np.empty(0, dtype=np.int64)
+        return np.empty(0), empty, empty, empty
+
+    pair_ids, history_firsts, history_seconds, sizes = (np.array(column) for column in zip(*history))
+
+    return np.sqrt(squared_lengths[pair_ids]), history_firsts, history_seconds, sizes
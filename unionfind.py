@@ -0,0 +1,285 @@
+"""
+disjoint sets over integer elements 0..n-1, stored in integer arrays.
+
+when elements are points, per component aggregates (count, coordinates sums,
+bounding box) can be kept up to date by the unions themselves.
+"""
+
+import numpy as np
+
+from geo.quadrant import Quadrant
+
+
+def as_rows(points, count, dimension=2):
+    """
+    (count, dimension) float array of points (dimension inferred if there are some).
+    """
+    points = np.asarray(points, dtype=np.float64)
+
+    if not count and points.ndim == 2:
+        dimension = points.shape[1]
+
+    return points.reshape(count, -1) if count else points.reshape(0, dimension)
+
+
+def grown(array, capacity):
+    """
+    copy of array whose last axis is extended to capacity (new entries undefined).
+    """
+    result = np.empty(array.shape[:-1] + (capacity,), dtype=array.dtype)
+    result[..., :array.shape[-1]] = array
+
+    return result
+
+
+class DisjointSet:
+    """
+        Union-find sur tableaux d'entiers.
+
+        - parent : parent de chaque élément (une racine est son propre parent)
+        - size : effectif de chaque composante, valable pour les racines
+
+        Les unions une à une se font par taille avec compression par moitié,
+        les unions en masse (union_pairs) accrochent chaque racine à la plus
+        petite racine voisine, par opérations sur tableaux.
+
+        Si des points sont donnés, chaque union met aussi à jour les agrégats
+        des racines (sums, lows, highs) et size reste toujours valable.
+
+        Exemple :
+
+            components = DisjointSet(len(points))
+            components.union_pairs(firsts, seconds)
+            sizes = components.component_sizes()
+    """
+
+    def __init__(self, size, points=None):
+        self.parent = np.arange(size, dtype=np.int64)
+        self.size = np.ones(size, dtype=np.int64)
+        self.stale_sizes = False # size à recalculer après union_pairs
+
+        # Tableaux de capacité doublée au besoin par add, dont parent, size et
+        # les agrégats sont les débuts
+        self.capacity = size
+        self.storage = {"parent": self.parent, "size": self.size}
+
+        # Agrégats, valables pour les racines : somme, minimum et maximum des
+        # coordonnées, rangés par axe (dimension, size) pour des mises à jour rapides
+        self.sums = self.lows = self.highs = None
+        if points is not None:
+            axes = np.ascontiguousarray(as_rows(points, size).T)
+            self.sums, self.lows, self.highs = axes, axes.copy(), axes.copy()
+            self.storage.update(sums=self.sums, lows=self.lows, highs=self.highs)
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self, count, points=None):
+        """
+            Ajoute count éléments isolés, retourne l'indice du premier.
+
+            points : coordonnées des nouveaux éléments (si les agrégats sont suivis)
+        """
+
+        first = len(self)
+        needed = first + count
+        names = ("parent", "size") if self.sums is None else ("parent", "size", "sums", "lows", "highs")
+
+        if needed > self.capacity:
+            self.capacity = max(needed, 2 * self.capacity)
+            self.storage = {name: grown(getattr(self, name), self.capacity) for name in names}
+
+        for name in names:
+            setattr(self, name, self.storage[name][..., :needed])
+
+        self.parent[first:] = np.arange(first, needed)
+        self.size[first:] = 1
+
+        if self.sums is not None and count:
+            axes = as_rows(points, count, len(self.sums)).T
+            self.sums[:, first:] = axes
+            self.lows[:, first:] = axes
+            self.highs[:, first:] = axes
+
+        return first
+
+    def find(self, element):
+        """ Racine d'un élément (compression par moitié). """
+
+        parent = self.parent
+        while parent[element] != element:
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+
+        return int(element)
+
+    def union(self, first, second):
+        """ Fusionne les composantes de deux éléments, retourne la racine commune. """
+
+        if self.stale_sizes:
+            self.count_sizes()
+
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return first
+
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+
+        if self.sums is not None:
+            self.sums[:, first] += self.sums[:, second]
+            self.lows[:, first] = np.minimum(self.lows[:, first], self.lows[:, second])
+            self.highs[:, first] = np.maximum(self.highs[:, first], self.highs[:, second])
+
+        return first
+
+    def find_all(self, elements):
+        """
+            Racines d'un tableau d'éléments.
+
+            Post-conditions :
+            - les éléments donnés pointent directement sur leur racine
+        """
+
+        parent = self.parent
+        roots = parent[elements]
+
+        while True:
+            grand_parents = parent[roots]
+            if (grand_parents == roots).all():
+                break
+
+            # Saut de pointeurs : les ancêtres atteints sautent une génération,
+            # la profondeur des chemins parcourus ensemble diminue de moitié
+            parent[roots] = parent[grand_parents]
+            roots = parent[roots]
+
+        parent[elements] = roots
+
+        return roots
+
+    def union_pairs(self, firsts, seconds):
+        """
+            Fusionne les composantes de chaque couple (firsts[i], seconds[i]).
+
+            Tant qu'une arête relie deux racines différentes, la plus grande
+            racine est accrochée à la plus petite racine voisine.
+        """
+
+        firsts = np.asarray(firsts, dtype=np.int64)
+        seconds = np.asarray(seconds, dtype=np.int64)
+
+        while len(firsts):
+            roots_a, roots_b = self.find_all(firsts), self.find_all(seconds)
+
+            pending = roots_a != roots_b
+            if not pending.any():
+                break
+
+            firsts, seconds = firsts[pending], seconds[pending]
+            roots_a, roots_b = roots_a[pending], roots_b[pending]
+
+            hooked = np.maximum(roots_a, roots_b)
+            np.minimum.at(self.parent, hooked, np.minimum(roots_a, roots_b))
+
+            if self.sums is None:
+                self.stale_sizes = True
+            else:
+                self._merge_aggregates(np.unique(hooked))
+
+    def _merge_aggregates(self, hooked):
+        """
+            Ajoute les agrégats des anciennes racines accrochées à ceux de
+            leur nouvelle racine (les racines finales n'ont pas été accrochées).
+        """
+
+        finals = self.find_all(hooked)
+
+        np.add.at(self.size, finals, self.size[hooked])
+
+        for sums, lows, highs in zip(self.sums, self.lows, self.highs):
+            np.add.at(sums, finals, sums[hooked])
+            np.minimum.at(lows, finals, lows[hooked])
+            np.maximum.at(highs, finals, highs[hooked])
+
+    def roots(self):
+        """ Racine de chaque élément (compression de tous les chemins). """
+
+        parent = self.parent
+        grand_parents = parent[parent]
+
+        while (grand_parents != parent).any():
+            parent = grand_parents
+            grand_parents = parent[parent]
+
+        # En place : parent reste le début de son tableau de capacité
+        if parent is not self.parent:
+            self.parent[:] = parent
+
+        return self.parent
+
+    def count_sizes(self):
+        """ Recalcule l'effectif des racines. """
+
+        self.size[:] = np.bincount(self.roots(), minlength=len(self))
+        self.stale_sizes = False
+
+    def component_sizes(self):
+        """ Effectifs des composantes, triés par ordre décroissant. """
+
+        sizes = np.bincount(self.roots())
+
+        return sorted(sizes[sizes > 0].tolist(), reverse=True)
+
+    def component_stats(self):
+        """
+            Agrégats de chaque composante (union-find construit avec des points),
+            rangés comme component_sizes (effectifs décroissants).
+        """
+
+        if self.stale_sizes:
+            self.count_sizes()
+
+        roots = np.flatnonzero(self.parent == np.arange(len(self)))
+        roots = roots[np.argsort(-self.size[roots], kind="stable")]
+
+        return ComponentStats(self.size[roots], self.sums[:, roots].T, self.lows[:, roots].T, self.highs[:, roots].T)
+
+
+class ComponentStats:
+    """
+        Agrégats des composantes, en colonnes (une ligne par composante,
+        par effectif décroissant, comme les labels de connectes.Clustering).
+
+        - counts : effectifs
+        - sums : sommes des coordonnées (k, dimension)
+        - lows, highs : coins de la boîte englobante (k, dimension)
+    """
+
+    def __init__(self, counts, sums, lows, highs):
+        self.counts = counts
+        self.sums = sums
+        self.lows = lows
+        self.highs = highs
+
+    @property
+    def centroids(self):
+        """ Barycentre de chaque composante. """
+
+        return self.sums / self.counts[:, None]
+
+    def quadrant(self, index):
+        """ Boîte englobante d'une composante, en Quadrant. """
+
+        return Quadrant(self.lows[index].tolist(), self.highs[index].tolist())
+
+    def quadrants(self):
+        """ Boîtes englobantes de toutes les composantes. """
+
+        return [Quadrant(low, high) for low, high in zip(self.lows.tolist(), self.highs.tolist())]
+
+    def __len__(self):
+        return len(self.counts)
@@ -1,83 +1,243 @@
 #!/usr/bin/env python3
+"""
+differential fuzzing of the clustering engines.
 
-from itertools import combinations
-from collections import defaultdict
-import sys
-import os
+random and adversarial instances (points exactly at distance, duplicates,
+negative coordinates, dense blobs) are clustered by every engine and compared
+with a brute force reference computing all pairwise distances. cases run in a
+process pool. the first failing instance is shrunk to a minimal one and saved
+in test-fail.txt.
 
-from geo.point import Point
-from geo.tycat   import tycat
+    ./validity.py --cases 2000 --max-points 2000 --jobs 8
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from geo.tycat import tycat
 
 import libtests
 import connectes
+import parallel
+import streaming
+import thresholds
+from incremental import IncrementalClusterer
 
-GRAPH_SIZE = 4
-DISTANCE = 0.5
+FAIL_FILE = 'test-fail.txt'
 
-def main():
-    print()
+# Nombre de lignes de la matrice des distances calculées à la fois
+REFERENCE_ROWS = 256
 
-    # Progress
-    total_try, current_try = 2 ** ( GRAPH_SIZE * GRAPH_SIZE ), 0
+# Nombre de bandes (et de processus) du moteur parallèle
+PARALLEL_JOBS = 3
 
-    # N2 Algo
-    groups, register = defaultdict(set), {}
 
-    with open(os.devnull, 'w') as out_null:
-        for nb_points in range(1, GRAPH_SIZE * GRAPH_SIZE + 1):
-            for graph in combinations(range(GRAPH_SIZE * GRAPH_SIZE), nb_points):
-                current_try += 1
-                libtests.printProgressBar(current_try, total_try)
-                
-                # -- Run n2 algo --
-                points = [(value % GRAPH_SIZE - (GRAPH_SIZE // 2), value // GRAPH_SIZE - (GRAPH_SIZE // 2)) for value in graph]
+# x-------------x
+# |  Reference  |
+# x-------------x
 
-                groups.clear()
-                register.clear()
+def reference_sizes(distance, points):
+    """
+        Tailles triées des composantes, par calcul de toutes les distances.
 
-                for point_id in range(len(points)):
-                    register[point_id] = point_id
-                    groups[point_id].add(point_id)
+        Parcours en largeur depuis chaque point non visité : les distances
+        du front aux points non visités sont calculées par blocs de lignes.
+        N'utilise pas unionfind, dont dépendent les moteurs testés.
+    """
 
-                for point_id, aside_id in filter(lambda duo: register[duo[0]] != register[duo[1]] and connectes.is_at_distance(points[duo[0]], points[duo[1]], DISTANCE), combinations(range(len(points)), 2)):
-                    old_ref = register[aside_id]
-                    groups[register[point_id]].update(groups[old_ref])
+    square_distance = distance * distance
+    unvisited = np.ones(len(points), dtype=bool)
+    sizes = []
 
-                    for other_id in groups[old_ref]:
-                        register[other_id] = register[point_id]
+    for start_point in range(len(points)):
+        if not unvisited[start_point]:
+            continue
 
-                    groups.pop(old_ref)
+        unvisited[start_point] = False
+        front, size = np.array([start_point]), 0
 
-                counts = list((len(group) for group in groups.values()))
-                counts.sort(reverse=True)
-                    
-                # -- Run better algo --
-                sys.stdout = out_null
-                project_counts = connectes.main_perfs(DISTANCE, points)    
-                sys.stdout = sys.__stdout__
+        while len(front):
+            size += len(front)
+            reached = []
 
-                # Différent result
-                if counts != project_counts:
-                    print('\n  --', 'Erreur', '--')
-                    print('  Points :', points)
-                    print('  Attendu : ', counts)
-                    print('\n  Résultat : ', project_counts)
+            for start in range(0, len(front), REFERENCE_ROWS):
+                rows = points[front[start:start + REFERENCE_ROWS]]
+                candidates = np.flatnonzero(unvisited)
 
-                    with open('test-fail.txt', 'w') as file:
-                        file.write(f"{DISTANCE}\n")
+                dx = points[None, candidates, 0] - rows[:, None, 0]
+                dy = points[None, candidates, 1] - rows[:, None, 1]
+                near = candidates[(dx*dx + dy*dy <= square_distance).any(axis=0)]
 
-                        for point in points:
-                            file.write(f"{point[0]}, {point[1]}\n")
+                unvisited[near] = False
+                reached.append(near)
 
-                    tycat([Point(point) for point in points])
+            front = np.concatenate(reached)
 
-                    return
+        sizes.append(size)
 
-    libtests.printProgressBar(1, 1)
+    return sorted(sizes, reverse=True)
 
-    print("\n  Validation terminée !\n")
 
+# x---------x
+# |  Cases  |
+# x---------x
+
+def incremental_sizes(distance, points):
+    """
+    sizes computed by adding points in a few batches.
+    """
+    clusterer = IncrementalClusterer(distance)
+
+    for batch in np.array_split(points, 3):
+        clusterer.add_points(batch)
+
+    return clusterer.component_sizes()
+
+
+def external_sizes(distance, points):
+    """
+    sizes computed by the out-of-core sweep, with small blocks and runs.
+    """
+    blocks = np.array_split(points, max(1, len(points) // 64))
+
+    return streaming.external_components_sizes(distance, blocks, run_size=max(1, len(points) // 3))
+
+
+ENGINES = {
+    **{name: lambda distance, points, engine=engine: engine(distance, points).component_sizes()
+       for name, engine in connectes.ENGINES.items()},
+    "thresholds": lambda distance, points: thresholds.components_sizes_by_distance([distance], points)[distance],
+    "incremental": incremental_sizes,
+    "parallel": lambda distance, points: parallel.components_sizes(distance, points, PARALLEL_JOBS),
+    "external": external_sizes,
+}
+
+
+def generate_case(seed, max_points):
+    """
+        Instance aléatoire (distance, points) d'une des familles suivantes :
+        - uniforme
+        - réseau de pas exactement distance (couples à distance limite)
+        - doublons
+        - coordonnées négatives
+        - amas denses
+    """
+
+    rng = np.random.default_rng(seed)
+
+    count = int(np.exp(rng.uniform(0, np.log(max_points))))
+    distance = float(rng.choice([0.5, 0.1, 0.05, 0.01, 1 / 3]))
+    family = seed % 5
+
+    if family == 0:
+        points = rng.random((count, 2))
+    elif family == 1:
+        side = max(1, int(np.sqrt(count)))
+        points = rng.integers(-side, side, (count, 2)) * distance
+    elif family == 2:
+        points = rng.random((max(1, count // 8), 2))[rng.integers(0, max(1, count // 8), count)]
+    elif family == 3:
+        points = rng.uniform(-1, 0, (count, 2)) * rng.choice([1, 10])
+    else:
+        centers = rng.uniform(-1, 1, (max(1, count // 200), 2))
+        points = centers[rng.integers(0, len(centers), count)] + rng.normal(0, distance, (count, 2))
+
+    return distance, np.ascontiguousarray(points, dtype=np.float64)
+
+
+def failing_engines(distance, points):
+    """
+    engines whose result differs from the reference.
+    """
+    expected = reference_sizes(distance, points)
+
+    return [name for name, engine in ENGINES.items() if engine(distance, points) != expected]
+
+
+def run_case(arguments):
+    """
+    (seed, failing engines) of one case, run in a worker process.
+    """
+    seed, max_points = arguments
+
+    return seed, failing_engines(*generate_case(seed, max_points))
+
+
+# x----------x
+# |  Shrink  |
+# x----------x
+
+def shrink(distance, points):
+    """
+        Réduit une instance fautive en retirant des blocs de points
+        (de plus en plus petits) tant que l'erreur persiste.
+    """
+
+    chunks = 2
+    while len(points) > 1 and chunks <= 2 * len(points):
+        for chunk in np.array_split(np.arange(len(points)), min(chunks, len(points))):
+            smaller = np.delete(points, chunk, axis=0)
+
+            if len(smaller) and failing_engines(distance, smaller):
+                points = smaller
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            chunks *= 2
+
+    return points
+
+
+def save_failure(distance, points):
+    """
+    writes instance in FAIL_FILE (.pts format).
+    """
+    with open(FAIL_FILE, 'w', encoding='utf-8') as file:
+        file.write(f"{distance}\n")
+
+        for point in points.tolist():
+            file.write(f"{point[0]}, {point[1]}\n")
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--cases", type=int, default=1000)
+    parser.add_argument("--max-points", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first case")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--display", action="store_true", help="tycat the shrunk failing instance")
+    arguments = parser.parse_args()
+
+    print()
+
+    cases = [(seed, arguments.max_points) for seed in range(arguments.seed, arguments.seed + arguments.cases)]
+
+    with ProcessPoolExecutor(max_workers=arguments.jobs) as pool:
+        for current_try, (seed, failing) in enumerate(pool.map(run_case, cases, chunksize=8), 1):
+            libtests.printProgressBar(current_try, len(cases))
+
+            # Différent result
+            if failing:
+                distance, points = generate_case(seed, arguments.max_points)
+                points = shrink(distance, points)
+                save_failure(distance, points)
+
+                print('\n  --', 'Erreur', '--')
+                print('  Graine :', seed, ', moteurs :', ', '.join(failing))
+                print('  Points :', points.tolist())
+                print('  Attendu : ', reference_sizes(distance, points))
+                print('  Instance réduite sauvée dans', FAIL_FILE)
+
+                if arguments.display:
+                    tycat(points)
+
+                pool.shutdown(cancel_futures=True)
+                return
+
+    print("\n  Validation terminée !\n")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
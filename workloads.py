@@ -0,0 +1,112 @@
+"""
+seeded point distributions in the unit square, for benchmarks and tests.
+
+    points = generate("blobs", 10000, seed=3)
+
+large instances are drawn by blocks, the layout (centers, segments...) being
+drawn once from the seed :
+
+    for block in iter_generate("filaments", 10 ** 7, seed=3):
+        ...
+"""
+
+import numpy as np
+
+BLOCK_SIZE = 1 << 20 # points drawn at a time by iter_generate
+
+
+# each workload draws its layout for count points from rng, then returns a
+# function drawing a block of given size of points
+
+def uniform(rng, count):
+    """
+    points uniformly drawn in the unit square.
+    """
+    return lambda block: rng.random((block, 2))
+
+
+def blobs(rng, count, blobs_count=None, spread=0.01):
+    """
+    gaussian clusters around uniformly drawn centers.
+    """
+    blobs_count = blobs_count or max(1, count // 1000)
+    centers = rng.random((blobs_count, 2))
+
+    return lambda block: centers[rng.integers(0, blobs_count, block)] + rng.normal(0, spread, (block, 2))
+
+
+def filaments(rng, count, filaments_count=None, noise=0.002):
+    """
+    points along random segments, slightly shifted.
+    """
+    filaments_count = filaments_count or max(1, count // 5000)
+    starts, ends = rng.random((filaments_count, 2)), rng.random((filaments_count, 2))
+
+    def draw(block):
+        filament_ids = rng.integers(0, filaments_count, block)
+        positions = rng.random((block, 1))
+
+        return (starts[filament_ids] + positions * (ends - starts)[filament_ids]
+                + rng.normal(0, noise, (block, 2)))
+
+    return draw
+
+
+def grid_duplicates(rng, count, duplicates=16):
+    """
+    points drawn on a regular lattice, about duplicates points per node.
+    """
+    side = max(1, int(np.sqrt(count / duplicates)))
+
+    return lambda block: rng.integers(0, side, (block, 2)) / side
+
+
+def lattice(rng, count):
+    """
+    nodes of a regular lattice of about count nodes, in random order.
+    """
+    side = max(1, int(np.ceil(np.sqrt(count))))
+
+    def draw(block):
+        nodes = rng.integers(0, side * side, block)
+        return np.column_stack((nodes // side, nodes % side)) / side
+
+    return draw
+
+
+def duplicates(rng, count, distinct=None):
+    """
+    few distinct uniform points (count // 100), each repeated many times.
+    """
+    distinct = distinct or max(1, count // 100)
+    originals = rng.random((distinct, 2))
+
+    return lambda block: originals[rng.integers(0, distinct, block)]
+
+
+WORKLOADS = {
+    "uniform": uniform,
+    "blobs": blobs,
+    "filaments": filaments,
+    "grid_duplicates": grid_duplicates,
+    "lattice": lattice,
+    "duplicates": duplicates,
+}
+
+
+def iter_generate(workload, count, seed=0, block_size=BLOCK_SIZE):
+    """
+    iterates on (block, 2) float arrays, count points in total.
+    the points are the same for the same seed and block size.
+    """
+    draw = WORKLOADS[workload](np.random.default_rng(seed), count)
+
+    for start in range(0, count, block_size):
+        yield draw(min(block_size, count - start))
+
+
+def generate(workload, count, seed=0):
+    """
+    (count, 2) float array of given workload, the same for the same seed.
+    """
+    return WORKLOADS[workload](np.random.default_rng(seed), count)(count)